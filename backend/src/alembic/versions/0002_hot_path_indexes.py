@@ -0,0 +1,88 @@
+"""Индексы для горячих путей выборки
+
+Индексы создаются через CREATE INDEX CONCURRENTLY, поэтому миграция
+не блокирует запись в таблицы. CONCURRENTLY нельзя выполнять внутри
+транзакции, поэтому операции обёрнуты в autocommit_block.
+
+Revision ID: 0002_hot_path_indexes
+Revises: 0001_initial
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002_hot_path_indexes"
+down_revision: Union[str, None] = "0001_initial"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ("ix_users_login", "users", ["login"], {"unique": True}),
+    ("ix_users_role_id", "users", ["role_id"], {}),
+    ("ix_users_created_at", "users", ["created_at"], {}),
+    (
+        "ix_documents_patient_id_subdirectory_type",
+        "documents",
+        ["patient_id", "subdirectory_type", "created_at"],
+        {},
+    ),
+    (
+        "ix_documents_author_id_created_at",
+        "documents",
+        ["author_id", "created_at"],
+        {},
+    ),
+    (
+        "ix_documents_created_at_brin",
+        "documents",
+        ["created_at"],
+        {"postgresql_using": "brin"},
+    ),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, columns, options in INDEXES:
+            # Прерванный CONCURRENTLY оставляет невалидный индекс,
+            # который IF NOT EXISTS молча пропустил бы
+            op.execute(
+                f"""
+                DO $$
+                BEGIN
+                    IF EXISTS (
+                        SELECT 1 FROM pg_index i
+                        JOIN pg_class c ON c.oid = i.indexrelid
+                        WHERE c.relname = '{name}' AND NOT i.indisvalid
+                    ) THEN
+                        EXECUTE 'DROP INDEX {name}';
+                    END IF;
+                END $$
+                """
+            )
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+                **options,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
@@ -0,0 +1,200 @@
+"""Дневные агрегаты для аналитики
+
+Таблицы daily_* поддерживаются триггерами на documents и users и
+заполняются текущими данными. Триггеры создаются до заполнения в той же
+транзакции: блокировка CREATE TRIGGER не даёт параллельным записям
+проскочить между заполнением и включением триггеров.
+
+Revision ID: 0003_daily_rollups
+Revises: 0002_hot_path_indexes
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003_daily_rollups"
+down_revision: Union[str, None] = "0002_hot_path_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def timestamps() -> list:
+    return [
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    ]
+
+
+DOCUMENTS_ROLLUP_FUNCTION = """
+CREATE OR REPLACE FUNCTION rollup_documents() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE daily_document_stats
+        SET documents_count = documents_count - 1, updated_at = now()
+        WHERE day = OLD.created_at::date
+          AND author_id IS NOT DISTINCT FROM OLD.author_id
+          AND subdirectory_type = OLD.subdirectory_type;
+
+        DELETE FROM daily_document_stats
+        WHERE day = OLD.created_at::date
+          AND author_id IS NOT DISTINCT FROM OLD.author_id
+          AND subdirectory_type = OLD.subdirectory_type
+          AND documents_count <= 0;
+
+        UPDATE daily_patient_activity
+        SET documents_count = documents_count - 1, updated_at = now()
+        WHERE day = OLD.created_at::date AND patient_id = OLD.patient_id;
+
+        DELETE FROM daily_patient_activity
+        WHERE day = OLD.created_at::date
+          AND patient_id = OLD.patient_id
+          AND documents_count <= 0;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO daily_document_stats AS s
+            (day, author_id, subdirectory_type, documents_count)
+        VALUES (NEW.created_at::date, NEW.author_id, NEW.subdirectory_type, 1)
+        ON CONFLICT (day, author_id, subdirectory_type) DO UPDATE
+        SET documents_count = s.documents_count + 1, updated_at = now();
+
+        INSERT INTO daily_patient_activity AS s (day, patient_id, documents_count)
+        VALUES (NEW.created_at::date, NEW.patient_id, 1)
+        ON CONFLICT (day, patient_id) DO UPDATE
+        SET documents_count = s.documents_count + 1, updated_at = now();
+    END IF;
+
+    RETURN NULL;
+END
+$$
+"""
+
+USERS_ROLLUP_FUNCTION = """
+CREATE OR REPLACE FUNCTION rollup_users() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE daily_user_stats
+        SET users_count = users_count - 1, updated_at = now()
+        WHERE day = OLD.created_at::date AND role_id = OLD.role_id;
+
+        DELETE FROM daily_user_stats
+        WHERE day = OLD.created_at::date
+          AND role_id = OLD.role_id
+          AND users_count <= 0;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO daily_user_stats AS s (day, role_id, users_count)
+        VALUES (NEW.created_at::date, NEW.role_id, 1)
+        ON CONFLICT (day, role_id) DO UPDATE
+        SET users_count = s.users_count + 1, updated_at = now();
+    END IF;
+
+    RETURN NULL;
+END
+$$
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    subdirectories = postgresql.ENUM(name="subdirectories", create_type=False)
+
+    op.create_table(
+        "daily_document_stats",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("author_id", sa.Integer(), nullable=True),
+        sa.Column("subdirectory_type", subdirectories, nullable=False),
+        sa.Column("documents_count", sa.Integer(), nullable=False),
+        *timestamps(),
+        sa.UniqueConstraint(
+            "day",
+            "author_id",
+            "subdirectory_type",
+            name="uq_daily_document_stats",
+            postgresql_nulls_not_distinct=True,
+        ),
+    )
+    op.create_table(
+        "daily_patient_activity",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("patient_id", sa.Integer(), nullable=False),
+        sa.Column("documents_count", sa.Integer(), nullable=False),
+        *timestamps(),
+        sa.UniqueConstraint("day", "patient_id", name="uq_daily_patient_activity"),
+    )
+    op.create_table(
+        "daily_user_stats",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("role_id", sa.Integer(), nullable=False),
+        sa.Column("users_count", sa.Integer(), nullable=False),
+        *timestamps(),
+        sa.UniqueConstraint("day", "role_id", name="uq_daily_user_stats"),
+    )
+
+    op.execute(DOCUMENTS_ROLLUP_FUNCTION)
+    op.execute(USERS_ROLLUP_FUNCTION)
+    op.execute(
+        """
+        CREATE TRIGGER documents_rollup
+        AFTER INSERT OR DELETE
+            OR UPDATE OF created_at, author_id, subdirectory_type, patient_id
+        ON documents
+        FOR EACH ROW EXECUTE FUNCTION rollup_documents()
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER users_rollup
+        AFTER INSERT OR DELETE OR UPDATE OF created_at, role_id
+        ON users
+        FOR EACH ROW EXECUTE FUNCTION rollup_users()
+        """
+    )
+
+    op.execute(
+        """
+        INSERT INTO daily_document_stats
+            (day, author_id, subdirectory_type, documents_count)
+        SELECT created_at::date, author_id, subdirectory_type, count(*)
+        FROM documents
+        GROUP BY 1, 2, 3
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO daily_patient_activity (day, patient_id, documents_count)
+        SELECT created_at::date, patient_id, count(*)
+        FROM documents
+        GROUP BY 1, 2
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO daily_user_stats (day, role_id, users_count)
+        SELECT created_at::date, role_id, count(*)
+        FROM users
+        GROUP BY 1, 2
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS users_rollup ON users")
+    op.execute("DROP TRIGGER IF EXISTS documents_rollup ON documents")
+    op.execute("DROP FUNCTION IF EXISTS rollup_users()")
+    op.execute("DROP FUNCTION IF EXISTS rollup_documents()")
+    op.drop_table("daily_user_stats")
+    op.drop_table("daily_patient_activity")
+    op.drop_table("daily_document_stats")
@@ -0,0 +1,49 @@
+"""BRIN индексы по created_at для аналитики по временным окнам
+
+patients и documents пополняются в порядке времени, поэтому BRIN по
+created_at занимает несколько страниц и отсекает почти все блоки таблицы
+при выборке за окно. autosummarize сразу описывает новые диапазоны
+страниц, иначе они просматриваются целиком до ближайшего VACUUM.
+
+Revision ID: 0004_brin_created_at
+Revises: 0003_daily_rollups
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004_brin_created_at"
+down_revision: Union[str, None] = "0003_daily_rollups"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("ALTER INDEX ix_documents_created_at_brin SET (autosummarize = on)")
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_patients_created_at_brin")
+        op.create_index(
+            "ix_patients_created_at_brin",
+            "patients",
+            ["created_at"],
+            postgresql_using="brin",
+            postgresql_with={"autosummarize": "on"},
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_patients_created_at_brin",
+            table_name="patients",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.execute("ALTER INDEX ix_documents_created_at_brin RESET (autosummarize)")
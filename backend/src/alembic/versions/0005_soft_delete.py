@@ -0,0 +1,129 @@
+"""Мягкое удаление пациентов и документов
+
+Удаление помечает строки deleted_at, физически их удаляет задача
+tasks.purge_deleted. Триггер дневных агрегатов учитывает только живые
+строки: пометка удаления вычитает документ из агрегатов, а последующее
+физическое удаление их уже не меняет.
+
+Revision ID: 0005_soft_delete
+Revises: 0004_brin_created_at
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005_soft_delete"
+down_revision: Union[str, None] = "0004_brin_created_at"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+DOCUMENTS_ROLLUP_FUNCTION = """
+CREATE OR REPLACE FUNCTION rollup_documents() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE'){old_live} THEN
+        UPDATE daily_document_stats
+        SET documents_count = documents_count - 1, updated_at = now()
+        WHERE day = OLD.created_at::date
+          AND author_id IS NOT DISTINCT FROM OLD.author_id
+          AND subdirectory_type = OLD.subdirectory_type;
+
+        DELETE FROM daily_document_stats
+        WHERE day = OLD.created_at::date
+          AND author_id IS NOT DISTINCT FROM OLD.author_id
+          AND subdirectory_type = OLD.subdirectory_type
+          AND documents_count <= 0;
+
+        UPDATE daily_patient_activity
+        SET documents_count = documents_count - 1, updated_at = now()
+        WHERE day = OLD.created_at::date AND patient_id = OLD.patient_id;
+
+        DELETE FROM daily_patient_activity
+        WHERE day = OLD.created_at::date
+          AND patient_id = OLD.patient_id
+          AND documents_count <= 0;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE'){new_live} THEN
+        INSERT INTO daily_document_stats AS s
+            (day, author_id, subdirectory_type, documents_count)
+        VALUES (NEW.created_at::date, NEW.author_id, NEW.subdirectory_type, 1)
+        ON CONFLICT (day, author_id, subdirectory_type) DO UPDATE
+        SET documents_count = s.documents_count + 1, updated_at = now();
+
+        INSERT INTO daily_patient_activity AS s (day, patient_id, documents_count)
+        VALUES (NEW.created_at::date, NEW.patient_id, 1)
+        ON CONFLICT (day, patient_id) DO UPDATE
+        SET documents_count = s.documents_count + 1, updated_at = now();
+    END IF;
+
+    RETURN NULL;
+END
+$$
+"""
+
+DOCUMENTS_ROLLUP_TRIGGER = """
+CREATE TRIGGER documents_rollup
+AFTER INSERT OR DELETE
+    OR UPDATE OF created_at, author_id, subdirectory_type, patient_id{columns}
+ON documents
+FOR EACH ROW EXECUTE FUNCTION rollup_documents()
+"""
+
+INDEXES = [
+    ("ix_patients_deleted_at", "patients"),
+    ("ix_documents_deleted_at", "documents"),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("patients", sa.Column("deleted_at", sa.DateTime(), nullable=True))
+    op.add_column("documents", sa.Column("deleted_at", sa.DateTime(), nullable=True))
+
+    op.execute(
+        DOCUMENTS_ROLLUP_FUNCTION.format(
+            old_live=" AND OLD.deleted_at IS NULL",
+            new_live=" AND NEW.deleted_at IS NULL",
+        )
+    )
+    op.execute("DROP TRIGGER documents_rollup ON documents")
+    op.execute(DOCUMENTS_ROLLUP_TRIGGER.format(columns=", deleted_at"))
+
+    with op.get_context().autocommit_block():
+        for name, table in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            op.create_index(
+                name,
+                table,
+                ["deleted_at"],
+                postgresql_where=sa.text("deleted_at IS NOT NULL"),
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table, postgresql_concurrently=True, if_exists=True
+            )
+
+    # Помеченные строки уже вычтены из агрегатов, поэтому удаляются до
+    # возврата прежнего триггера
+    op.execute("DELETE FROM documents WHERE deleted_at IS NOT NULL")
+    op.execute("DELETE FROM patients WHERE deleted_at IS NOT NULL")
+
+    op.execute(DOCUMENTS_ROLLUP_FUNCTION.format(old_live="", new_live=""))
+    op.execute("DROP TRIGGER documents_rollup ON documents")
+    op.execute(DOCUMENTS_ROLLUP_TRIGGER.format(columns=""))
+
+    op.drop_column("documents", "deleted_at")
+    op.drop_column("patients", "deleted_at")
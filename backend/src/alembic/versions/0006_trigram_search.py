@@ -0,0 +1,52 @@
+"""Триграммные индексы для поиска по ФИО
+
+GIN индексы gin_trgm_ops обслуживают ILIKE '%...%' и оператор <%
+(word_similarity), поэтому поиск по части или опечатке в ФИО не читает
+таблицу целиком.
+
+Revision ID: 0006_trigram_search
+Revises: 0005_soft_delete
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006_trigram_search"
+down_revision: Union[str, None] = "0005_soft_delete"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ("ix_patients_fio_trgm", "patients"),
+    ("ix_users_fio_trgm", "users"),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    with op.get_context().autocommit_block():
+        for name, table in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            op.create_index(
+                name,
+                table,
+                ["fio"],
+                postgresql_using="gin",
+                postgresql_ops={"fio": "gin_trgm_ops"},
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table, postgresql_concurrently=True, if_exists=True
+            )
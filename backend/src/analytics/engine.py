@@ -0,0 +1,355 @@
+"""Аналитика в памяти процесса (включается ANALYTICS_ENGINE).
+
+Факты для статистики малы: документ - это день, автор, пациент и раздел,
+пользователь - день и роль. Они загружаются в массивы NumPy при старте,
+документы отсортированы по дню, поэтому окно находится бинарным поиском,
+а агрегаты считаются векторными операциями без запросов к БД.
+
+Обновление раз в analytics_refresh_interval секунд читает документы с
+updated_at после последнего виденного (с запасом analytics_delta_overlap на
+долгие транзакции), пользователей и роли целиком. Изменения, которые не
+трогают updated_at (SET NULL автора при удалении пользователя, ручные
+правки), исправляет полная перезагрузка раз в analytics_reload_interval.
+Если обновления не проходят дольше analytics_max_staleness, статистика
+снова считается в БД.
+"""
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import time
+
+from sqlalchemy import Date, Integer, cast, func, literal, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+import numpy as np
+
+from config import settings, logger
+from db.db import async_session_maker, stream_query
+from db.series import GRANULARITIES, Granularity
+from db.time_window import TimeWindow
+from models.models import Document, Role, SubDirectories, User
+
+EPOCH = date(1970, 1, 1)
+SUBDIRECTORIES = list(SubDirectories)
+SUBDIRECTORY_CODES = {
+    subdirectory: code for code, subdirectory in enumerate(SUBDIRECTORIES)
+}
+
+
+def epoch_day(column):
+    """День как число дней от 1970-01-01, как в массивах движка"""
+    return cast(cast(column, Date) - literal(EPOCH, Date), Integer)
+
+
+def to_day(value: date) -> int:
+    return (value - EPOCH).days
+
+
+def bucket_starts(days: np.ndarray, granularity: Granularity) -> np.ndarray:
+    """Начало интервала для каждого дня, как date_trunc в db.series"""
+    if granularity == "day":
+        return days
+    if granularity == "week":
+        # 1970-01-01 - четверг, неделя начинается с понедельника
+        return days - (days + 3) % 7
+    months = days.astype("datetime64[D]").astype("datetime64[M]")
+    return months.astype("datetime64[D]").astype(days.dtype)
+
+
+@dataclass(frozen=True)
+class DocumentFacts:
+    """Живые документы, отсортированные по дню"""
+
+    id: np.ndarray = field(default_factory=lambda: np.empty(0, np.int64))
+    day: np.ndarray = field(default_factory=lambda: np.empty(0, np.int32))
+    author: np.ndarray = field(default_factory=lambda: np.empty(0, np.int32))
+    patient: np.ndarray = field(default_factory=lambda: np.empty(0, np.int32))
+    subdirectory: np.ndarray = field(default_factory=lambda: np.empty(0, np.int8))
+
+    @classmethod
+    def from_rows(cls, rows: List[Tuple]) -> "DocumentFacts":
+        if not rows:
+            return cls()
+        ids, days, authors, patients, subdirectories = zip(*rows)
+        return cls(
+            np.fromiter(ids, np.int64, len(rows)),
+            np.fromiter(days, np.int32, len(rows)),
+            np.fromiter(authors, np.int32, len(rows)),
+            np.fromiter(patients, np.int32, len(rows)),
+            np.fromiter(
+                (SUBDIRECTORY_CODES[s] for s in subdirectories), np.int8, len(rows)
+            ),
+        )
+
+    @classmethod
+    def concat(cls, parts: List["DocumentFacts"]) -> "DocumentFacts":
+        if not parts:
+            return cls()
+        merged = cls(
+            *(
+                np.concatenate([getattr(part, name) for part in parts])
+                for name in ("id", "day", "author", "patient", "subdirectory")
+            )
+        )
+        return merged.take(np.argsort(merged.day, kind="stable"))
+
+    def take(self, index: np.ndarray) -> "DocumentFacts":
+        return DocumentFacts(
+            self.id[index],
+            self.day[index],
+            self.author[index],
+            self.patient[index],
+            self.subdirectory[index],
+        )
+
+    def window(self, window: TimeWindow) -> "DocumentFacts":
+        start, end = np.searchsorted(
+            self.day, [to_day(window.start_date), to_day(window.end_date)]
+        )
+        return self.take(slice(start, end))
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            getattr(self, name).nbytes
+            for name in ("id", "day", "author", "patient", "subdirectory")
+        )
+
+
+@dataclass(frozen=True)
+class UserFacts:
+    """Пользователи, отсортированные по дню"""
+
+    day: np.ndarray = field(default_factory=lambda: np.empty(0, np.int32))
+    role: np.ndarray = field(default_factory=lambda: np.empty(0, np.int32))
+
+    def window(self, window: TimeWindow) -> "UserFacts":
+        start, end = np.searchsorted(
+            self.day, [to_day(window.start_date), to_day(window.end_date)]
+        )
+        return UserFacts(self.day[start:end], self.role[start:end])
+
+
+@dataclass(frozen=True)
+class Buckets:
+    """Интервалы окна и номер интервала для каждого дня окна"""
+
+    start: int
+    starts: np.ndarray
+    day_bucket: np.ndarray
+
+    @classmethod
+    def for_window(cls, window: TimeWindow, granularity: Granularity) -> "Buckets":
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Неизвестная группировка: {granularity}")
+        start = to_day(window.start_date)
+        days = np.arange(start, to_day(window.end_date), dtype=np.int32)
+        starts, day_bucket = np.unique(
+            bucket_starts(days, granularity), return_inverse=True
+        )
+        return cls(start, starts, day_bucket)
+
+    @property
+    def dates(self) -> List[date]:
+        return self.starts.astype("datetime64[D]").tolist()
+
+    def index(self, days: np.ndarray) -> np.ndarray:
+        return self.day_bucket[days - self.start]
+
+    def count(self, days: np.ndarray) -> np.ndarray:
+        """Количество по интервалам для отсортированных дней окна: границы
+        дней находятся бинарным поиском, затем дни суммируются в интервалы"""
+        bounds = np.arange(self.start, self.start + len(self.day_bucket) + 1)
+        daily = np.diff(np.searchsorted(days, bounds))
+        return np.bincount(
+            self.day_bucket, weights=daily, minlength=len(self.starts)
+        ).astype(np.int64)
+
+
+class AnalyticsEngine:
+    def __init__(self):
+        self.documents = DocumentFacts()
+        self.users = UserFacts()
+        self.roles: Dict[int, str] = {}
+        self.loaded_at: Optional[float] = None
+        self.refreshed_at: Optional[float] = None
+        self.watermark: Optional[datetime] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return (
+            self.refreshed_at is not None
+            and time.monotonic() - self.refreshed_at < settings.analytics_max_staleness
+        )
+
+    def documents_series(
+        self, window: TimeWindow, granularity: Granularity, user_id: Optional[int]
+    ) -> Tuple[List[date], np.ndarray]:
+        facts = self.documents.window(window)
+        days = facts.day if user_id is None else facts.day[facts.author == user_id]
+        buckets = Buckets.for_window(window, granularity)
+        return buckets.dates, buckets.count(days)
+
+    def patients_series(
+        self, window: TimeWindow, granularity: Granularity
+    ) -> Tuple[List[date], np.ndarray]:
+        """Уникальные пациенты с документами в каждом интервале"""
+        facts = self.documents.window(window)
+        buckets = Buckets.for_window(window, granularity)
+        counts = np.zeros(len(buckets.starts), np.int64)
+        if len(facts.day):
+            index = buckets.index(facts.day).astype(np.int64)
+            stride = int(facts.patient.max()) + 1
+            pairs = np.unique(index * stride + facts.patient)
+            counts = np.bincount(pairs // stride, minlength=len(buckets.starts))
+        return buckets.dates, counts
+
+    def unique_patients(self, window: TimeWindow) -> int:
+        return int(np.unique(self.documents.window(window).patient).size)
+
+    def users_series(
+        self, window: TimeWindow, granularity: Granularity
+    ) -> Tuple[List[date], np.ndarray]:
+        buckets = Buckets.for_window(window, granularity)
+        return buckets.dates, buckets.count(self.users.window(window).day)
+
+    def roles_count(self, window: TimeWindow) -> List[Tuple[str, int]]:
+        """Как в SQL: только роли, у которых есть пользователи за период"""
+        roles, counts = np.unique(self.users.window(window).role, return_counts=True)
+        return [
+            (self.roles[int(role)], int(count))
+            for role, count in zip(roles, counts)
+            if int(role) in self.roles
+        ]
+
+    def documents_by_subdirectory(
+        self, window: TimeWindow
+    ) -> List[Tuple[SubDirectories, int]]:
+        counts = np.bincount(
+            self.documents.window(window).subdirectory, minlength=len(SUBDIRECTORIES)
+        )
+        return list(zip(SUBDIRECTORIES, (int(count) for count in counts)))
+
+    def documents_by_author(self, window: TimeWindow) -> Dict[Optional[int], int]:
+        authors, counts = np.unique(
+            self.documents.window(window).author, return_counts=True
+        )
+        return {
+            (int(author) if author >= 0 else None): int(count)
+            for author, count in zip(authors, counts)
+        }
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "ready": self.ready,
+            "documents": len(self.documents.id),
+            "users": len(self.users.day),
+            "memory_bytes": self.documents.nbytes
+            + self.users.day.nbytes
+            + self.users.role.nbytes,
+            "watermark": self.watermark.isoformat() if self.watermark else None,
+            "seconds_since_load": round(now - self.loaded_at, 1)
+            if self.loaded_at
+            else None,
+            "seconds_since_refresh": round(now - self.refreshed_at, 1)
+            if self.refreshed_at
+            else None,
+        }
+
+    async def _read_documents(
+        self, session_maker: async_sessionmaker, since: Optional[datetime]
+    ) -> Tuple[DocumentFacts, np.ndarray, Optional[datetime]]:
+        """Живые документы и id удалённых; при since - только изменённые"""
+        query = select(
+            Document.id,
+            epoch_day(Document.created_at),
+            func.coalesce(Document.author_id, -1),
+            Document.patient_id,
+            Document.subdirectory_type,
+            Document.deleted_at.is_not(None),
+            Document.updated_at,
+        )
+        if since is not None:
+            query = query.where(Document.updated_at > since).execution_options(
+                include_deleted=True
+            )
+
+        live, deleted = [], []
+        watermark = None
+        async for batch in stream_query(
+            query, settings.stream_max_batch_size, session_maker, scalars=False
+        ):
+            live.append(DocumentFacts.from_rows([row[:5] for row in batch if not row[5]]))
+            deleted.extend(row[0] for row in batch if row[5])
+            newest = max(row[6] for row in batch)
+            watermark = newest if watermark is None else max(watermark, newest)
+        return DocumentFacts.concat(live), np.array(deleted, np.int64), watermark
+
+    async def _read_users(self, session_maker: async_sessionmaker):
+        async with session_maker() as session:
+            users = (
+                await session.execute(
+                    select(epoch_day(User.created_at), User.role_id).order_by(
+                        User.created_at
+                    )
+                )
+            ).all()
+            roles = dict((await session.execute(select(Role.id, Role.name))).all())
+        users = UserFacts(
+            np.fromiter((row[0] for row in users), np.int32, len(users)),
+            np.fromiter((row[1] for row in users), np.int32, len(users)),
+        )
+        return users, roles
+
+    async def load(self, session_maker: async_sessionmaker = async_session_maker):
+        async with self._lock:
+            started = time.perf_counter()
+            documents, _, watermark = await self._read_documents(session_maker, None)
+            self.users, self.roles = await self._read_users(session_maker)
+            self.documents = documents
+            self.watermark = watermark or self.watermark
+            self.loaded_at = self.refreshed_at = time.monotonic()
+            logger.info(
+                f"Аналитика в памяти загружена: документов {len(documents.id)}, "
+                f"пользователей {len(self.users.day)}, "
+                f"{time.perf_counter() - started:.2f} с"
+            )
+
+    async def refresh(self, session_maker: async_sessionmaker = async_session_maker):
+        if (
+            self.loaded_at is None
+            or self.watermark is None
+            or time.monotonic() - self.loaded_at >= settings.analytics_reload_interval
+        ):
+            await self.load(session_maker)
+            return
+
+        async with self._lock:
+            since = self.watermark - timedelta(seconds=settings.analytics_delta_overlap)
+            changed, deleted, watermark = await self._read_documents(session_maker, since)
+            self.users, self.roles = await self._read_users(session_maker)
+
+            stale = np.concatenate([changed.id, deleted])
+            if len(stale):
+                keep = ~np.isin(self.documents.id, stale)
+                self.documents = DocumentFacts.concat(
+                    [self.documents.take(keep), changed]
+                )
+            self.watermark = max(self.watermark, watermark or self.watermark)
+            self.refreshed_at = time.monotonic()
+
+
+analytics_engine = AnalyticsEngine()
+
+
+async def run_refresh_loop(engine: AnalyticsEngine = analytics_engine):
+    while True:
+        await asyncio.sleep(settings.analytics_refresh_interval)
+        try:
+            await engine.refresh()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка обновления аналитики в памяти: {e}")
@@ -0,0 +1,189 @@
+"""HyperLogLog-скетчи пациентов с документами по дням и месяцам в Redis.
+
+Уникальные пациенты за произвольный период считаются PFCOUNT по
+объединению скетчей: целые месяцы периода берутся месячными ключами,
+края - дневными, поэтому даже пять лет укладываются примерно в
+120 ключей. Погрешность HyperLogLog в Redis - около 0.81%.
+
+Скетч нельзя уменьшить: удаление документа или смена пациента учитываются
+только пересборкой из daily_patient_activity (задача
+tasks.rebuild_patient_sketches). До первой пересборки ключа готовности нет,
+и подсчёт возвращает None, чтобы вызывающий код посчитал точно.
+"""
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set
+
+from redis import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import Connection, text
+
+from cache.utils import redis_client
+from config import settings, logger
+from db.time_window import TimeWindow
+
+SKETCH_KEY_PREFIX = "analytics:patients:hll"
+READY_KEY = f"{SKETCH_KEY_PREFIX}:ready"
+REBUILD_LOCK_KEY = f"{SKETCH_KEY_PREFIX}:rebuild"
+
+DAYS_QUERY = text(
+    """
+    SELECT day, array_agg(patient_id) AS patients
+    FROM daily_patient_activity
+    WHERE day >= :since
+    GROUP BY day
+    ORDER BY day
+    """
+)
+
+CHANGED_QUERY = text(
+    """
+    SELECT day, patient_id
+    FROM daily_patient_activity
+    WHERE day >= :since AND updated_at >= :changed_since
+    """
+)
+
+
+def day_key(day: date) -> str:
+    return f"{SKETCH_KEY_PREFIX}:day:{day.isoformat()}"
+
+
+def month_key(day: date) -> str:
+    return f"{SKETCH_KEY_PREFIX}:month:{day.isoformat()[:7]}"
+
+
+def next_month(day: date) -> date:
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def window_keys(window: TimeWindow) -> List[str]:
+    """Наименьший набор ключей, покрывающий окно: месяцы целиком, края по дням"""
+    keys = []
+    day, end = window.start_date, window.end_date
+    while day < end:
+        month_end = next_month(day)
+        if day.day == 1 and month_end <= end:
+            keys.append(month_key(day))
+            day = month_end
+        else:
+            keys.append(day_key(day))
+            day += timedelta(days=1)
+    return keys
+
+
+async def record_patient(patient_id: int, created_at: datetime) -> None:
+    """Добавляет пациента в скетчи дня и месяца создания документа"""
+    day = created_at.date()
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.pfadd(day_key(day), patient_id)
+            pipe.pfadd(month_key(day), patient_id)
+            await pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Не удалось обновить скетч пациентов за {day}: {e}")
+
+
+async def count_unique_patients(window: TimeWindow) -> Optional[int]:
+    """Оценка числа уникальных пациентов за окно или None, если скетчи
+    не собраны или Redis недоступен"""
+    keys = window_keys(window)
+    if not keys:
+        return 0
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.exists(READY_KEY)
+            pipe.pfcount(*keys)
+            ready, count = await pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Скетчи пациентов недоступны: {e}")
+        return None
+    return count if ready else None
+
+
+async def claim_rebuild() -> bool:
+    """True, если пересборка ещё не запрошена другим процессом"""
+    try:
+        return bool(
+            await redis_client.set(
+                REBUILD_LOCK_KEY, 1, nx=True, ex=settings.patient_sketch_rebuild_timeout
+            )
+        )
+    except RedisError:
+        return False
+
+
+@lru_cache
+def get_sync_redis() -> Redis:
+    return Redis.from_url(settings.redis_url, decode_responses=True)
+
+
+def add_patients(
+    redis: Redis, patients_by_day: Dict[date, Iterable[int]], prefix: str = ""
+) -> None:
+    with redis.pipeline(transaction=False) as pipe:
+        for day, patients in patients_by_day.items():
+            patients = list(patients)
+            pipe.pfadd(prefix + day_key(day), *patients)
+            pipe.pfadd(prefix + month_key(day), *patients)
+        pipe.execute()
+
+
+def rebuild_patient_sketches(
+    connection: Connection, redis: Redis, since: Optional[date] = None
+) -> Dict[str, int]:
+    """Пересобирает скетчи начиная с месяца since (None - за всё время).
+
+    Скетчи собираются во временных ключах и заменяют рабочие через RENAME,
+    чтобы подсчёт не видел наполовину собранные данные. Пациенты, добавленные
+    в рабочие ключи во время сборки, затем добавляются повторно по updated_at
+    агрегата с запасом analytics_delta_overlap на долгие транзакции.
+    """
+    since = since.replace(day=1) if since else date.min
+    started = connection.execute(text("SELECT now()::timestamp")).scalar_one()
+    prefix = f"{SKETCH_KEY_PREFIX}:tmp:"
+
+    built: Set[str] = set()
+    days = 0
+    rows = connection.execution_options(yield_per=100).execute(
+        DAYS_QUERY, {"since": since}
+    )
+    for partition in rows.partitions():
+        add_patients(redis, {row.day: row.patients for row in partition}, prefix)
+        for row in partition:
+            built.update((day_key(row.day), month_key(row.day)))
+        days += len(partition)
+
+    stale = []
+    for key in redis.scan_iter(f"{SKETCH_KEY_PREFIX}:*:*", count=1000):
+        kind, _, value = key[len(SKETCH_KEY_PREFIX) + 1:].partition(":")
+        if kind == "day" and value >= since.isoformat() and key not in built:
+            stale.append(key)
+        elif kind == "month" and value >= since.isoformat()[:7] and key not in built:
+            stale.append(key)
+
+    with redis.pipeline(transaction=True) as pipe:
+        for key in built:
+            pipe.rename(prefix + key, key)
+        if stale:
+            pipe.delete(*stale)
+        if since == date.min:
+            pipe.set(READY_KEY, started.isoformat())
+        pipe.delete(REBUILD_LOCK_KEY)
+        pipe.execute()
+
+    changed: Dict[date, List[int]] = {}
+    changed_since = started - timedelta(seconds=settings.analytics_delta_overlap)
+    for row in connection.execute(
+        CHANGED_QUERY, {"since": since, "changed_since": changed_since}
+    ):
+        changed.setdefault(row.day, []).append(row.patient_id)
+    if changed:
+        add_patients(redis, changed)
+
+    return {
+        "days": days,
+        "keys": len(built),
+        "removed": len(stale),
+        "readded": len(changed),
+    }
@@ -2,13 +2,14 @@ from fastapi import FastAPI, Depends, APIRouter, HTTPException, status, Request
 from fastapi.openapi.docs import get_swagger_ui_html, get_redoc_html
 from fastapi_cache.backends.redis import RedisBackend
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
 from fastapi_cache import FastAPICache
 from celery.result import AsyncResult
-from redis import asyncio as aioredis
 import uvicorn
 
 from typing import AsyncGenerator
+import asyncio
 
 from auth.auth import router as auth_router, get_current_user
 from routing.documents import router as documents_routing
@@ -18,9 +19,19 @@ from routing.users import router as user_routing
 from routing.roles import router as role_routing
 from routing.helper import router as helper_routing
 from tasks.tasks import celery, backup_database
+from metrics.metrics import (
+    get_metrics,
+    require_metrics_token,
+    instrument_engine_pool,
+    instrument_engine_queries,
+    track_db_queries,
+)
+from cache.utils import redis_client
 from config import settings, logger
 from init_db import init_db
-from db.db import engine
+from db.db import engine, replica_engine, get_async_session
+from reports.export import shutdown_export_executor
+from analytics.engine import analytics_engine, run_refresh_loop
 
 
 @asynccontextmanager
@@ -28,16 +39,21 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     try:
         logger.info("Инициализация приложения")
         logger.info("Инициализация Redis кэша...")
-        redis = aioredis.from_url(
-            settings.redis_url, encoding="utf8", decode_responses=True
-        )
-        FastAPICache.init(RedisBackend(redis), prefix="fastapi-cache")
+        FastAPICache.init(RedisBackend(redis_client), prefix="fastapi-cache")
         logger.info("Redis кэш инициализирован")
 
         logger.info("Инициализация базы данных...")
         await init_db(engine)
         logger.info("База данных инициализирована")
 
+        refresh_task = None
+        if settings.ANALYTICS_ENGINE:
+            try:
+                await analytics_engine.load()
+            except Exception as e:
+                logger.error(f"Аналитика в памяти не загружена, статистика из БД: {e}")
+            refresh_task = asyncio.create_task(run_refresh_loop())
+
         logger.info("Запуск начального бэкапа базы данных...")
         try:
             task = backup_database.delay()
@@ -48,16 +64,28 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
         yield
 
         logger.info("Завершение работы приложения")
+        if refresh_task is not None:
+            refresh_task.cancel()
         await FastAPICache.clear()
         logger.info("Redis кэш очищен")
+        shutdown_export_executor()
         await engine.dispose()
+        if replica_engine is not None:
+            await replica_engine.dispose()
         logger.info("Соединение с базой данных закрыто")
     except Exception as e:
         logger.error(f"Произошла ошибка при инициализации приложения: {e}")
 
 
+instrument_engine_pool(engine)
+instrument_engine_queries(engine)
+if replica_engine is not None:
+    instrument_engine_pool(replica_engine, "replica")
+    instrument_engine_queries(replica_engine)
+
 app = FastAPI(
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     docs_url=None,
     redoc_url=None,
     title="Priroda Razuma API",
@@ -97,12 +125,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Content-Disposition"],
+    expose_headers=["Content-Disposition", "X-DB-Queries"],
 )
 
+app.middleware("http")(track_db_queries)
+
+# Порядок важен: сессия запроса выбирает БД по пользователю, которого
+# get_current_user кладёт в request.state
 protected_router = APIRouter(
     prefix=settings.api_v1_prefix,
-    dependencies=[Depends(get_current_user)],
+    dependencies=[Depends(get_current_user), Depends(get_async_session)],
 )
 
 protected_router.include_router(user_routing)
@@ -112,6 +144,15 @@ protected_router.include_router(documents_routing)
 protected_router.include_router(analytics_routing)
 protected_router.include_router(helper_routing)
 
+# nginx проксирует /metrics как /api/metrics: размеры пулов, маршруты и
+# счётчики запросов отдаются только по статическому токену Prometheus
+app.add_api_route(
+    "/metrics",
+    get_metrics,
+    include_in_schema=False,
+    dependencies=[Depends(require_metrics_token)],
+)
+
 app.include_router(protected_router)
 app.include_router(auth_router, prefix=settings.api_v1_prefix)
 
@@ -3,6 +3,7 @@ from fastapi import (
     Depends,
     Form,
     HTTPException,
+    Request,
     status,
 )
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
@@ -13,8 +14,9 @@ import jwt
 from depends import get_user_service, get_role_service
 from services.users import UserService
 from services.roles import RoleService
-from .utils import validate_password, encode_jwt, decode_jwt, hash_password
-from models.models import User
+from .utils import validate_password_async, encode_jwt, decode_jwt
+from .principal import get_cached_principal, cache_principal
+from .throttling import login_throttle, get_client_ip
 from .schema import *
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -22,9 +24,10 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
 
 async def get_current_user(
+    request: Request,
     token: str = Depends(oauth2_scheme),
     user_service: UserService = Depends(get_user_service),
-) -> User:
+) -> Principal:
     try:
         payload = decode_jwt(token)
     except jwt.ExpiredSignatureError:
@@ -40,42 +43,44 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    user = await user_service.get_object_by_login(payload.get("sub"))
-
-    if not user or not user.active:
+    user_id = payload.get("user_id")
+    principal = await get_cached_principal(user_id) if user_id is not None else None
+
+    if principal is None:
+        # Сессия запроса ещё не открыта (она зависит от пользователя), поэтому
+        # поиск идёт в своей сессии основной БД, а не реплики
+        if user_id is not None:
+            user = await user_service.get_object_by_id(user_id)
+        else:
+            user = await user_service.get_object_by_login(payload.get("sub"))
+        if user:
+            principal = Principal.model_validate(user)
+            await cache_principal(principal)
+
+    if not principal or not principal.active or principal.login != payload.get("sub"):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Пользователь неактивен или удалён из системы",
         )
-    return user
+    request.state.principal = principal
+    return principal
 
 
 def require_role(allowed_roles: set[int] = None, min_role_id: int = None):
-    async def role_checker(
-        user: User = Depends(get_current_user),
-        user_service: UserService = Depends(get_user_service),
-    ):
-        fresh_user = await user_service.get_object_by_login(user.login)
-
-        if not fresh_user or not fresh_user.active:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Учетная запись деактивирована",
-            )
-
-        if allowed_roles is not None and fresh_user.role_id not in allowed_roles:
+    async def role_checker(user: Principal = Depends(get_current_user)):
+        if allowed_roles is not None and user.role_id not in allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Недостаточно прав для выполнения действия",
             )
 
-        if min_role_id is not None and fresh_user.role_id < min_role_id:
+        if min_role_id is not None and user.role_id < min_role_id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Недостаточно прав для выполнения действия",
             )
 
-        return fresh_user
+        return user
 
     return role_checker
 
@@ -83,20 +88,39 @@ def require_role(allowed_roles: set[int] = None, min_role_id: int = None):
 @router.post(
     "/login",
     response_model=Token,
+    responses={
+        401: {"description": "Неверные данные для входа"},
+        429: {"description": "Слишком много попыток входа"},
+    },
     description=f"Авторизация",
 )
 async def login(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
     user_service: UserService = Depends(get_user_service),
 ):
+    client_ip = get_client_ip(request)
+    retry_after = await login_throttle.acquire(form_data.username, client_ip)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Слишком много попыток входа. Повторите попытку позже",
+            headers={"Retry-After": str(retry_after)},
+        )
+
     user = await user_service.get_object_by_login(form_data.username)
 
-    if not user or not validate_password(form_data.password, user.password):
+    if not user or not await validate_password_async(
+        form_data.password, user.password
+    ):
+        await login_throttle.register_failure(form_data.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Неверные данные для входа",
         )
 
+    await login_throttle.reset(form_data.username)
+
     access_token_data = {
         "sub": user.login,
         "user_id": user.id,
@@ -130,7 +154,7 @@ async def refresh_token(
     user_service: UserService = Depends(get_user_service),
 ):
     try:
-        payload = decode_jwt(refresh_token)
+        payload = decode_jwt(refresh_token, use_cache=False)
     except jwt.ExpiredSignatureError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -0,0 +1,49 @@
+from redis.exceptions import RedisError
+
+from typing import Optional
+
+from cache.utils import redis_client
+from config import settings, logger
+from .schema import Principal
+
+PRINCIPAL_KEY_PREFIX = "auth:principal"
+
+
+def _principal_key(user_id: int) -> str:
+    return f"{PRINCIPAL_KEY_PREFIX}:{user_id}"
+
+
+async def get_cached_principal(user_id: int) -> Optional[Principal]:
+    try:
+        raw = await redis_client.get(_principal_key(user_id))
+    except RedisError as e:
+        logger.warning(f"Кэш пользователей недоступен: {e}")
+        return None
+    return Principal.model_validate_json(raw) if raw else None
+
+
+async def cache_principal(principal: Principal) -> None:
+    try:
+        await redis_client.set(
+            _principal_key(principal.id),
+            principal.model_dump_json(),
+            ex=settings.principal_cache_ttl,
+        )
+    except RedisError as e:
+        logger.warning(f"Не удалось сохранить пользователя в кэш: {e}")
+
+
+async def invalidate_principal(user_id: int) -> None:
+    try:
+        await redis_client.delete(_principal_key(user_id))
+    except RedisError as e:
+        logger.error(f"Не удалось сбросить кэш пользователя {user_id}: {e}")
+
+
+async def invalidate_all_principals() -> None:
+    try:
+        keys = [key async for key in redis_client.scan_iter(f"{PRINCIPAL_KEY_PREFIX}:*")]
+        if keys:
+            await redis_client.delete(*keys)
+    except RedisError as e:
+        logger.error(f"Не удалось сбросить кэш пользователей: {e}")
@@ -1,5 +1,4 @@
-from pydantic import BaseModel, validator
-import bcrypt
+from pydantic import BaseModel, ConfigDict
 
 
 class BaseUser(BaseModel):
@@ -14,16 +13,15 @@ class Token(BaseModel):
     user_id: int
 
 
-class UserLogin(BaseUser):
-    pass
-
-
-class UserRegister(BaseUser):
+class Principal(BaseModel):
+    id: int
+    login: str
     fio: str
     role_id: int
+    active: bool
 
-    @validator("password")
-    def hash_password(cls, password: str) -> bytes:
-        salt = bcrypt.gensalt()
-        pwd_bytes: bytes = password.encode()
-        return bcrypt.hashpw(pwd_bytes, salt)
+    model_config = ConfigDict(from_attributes=True)
+
+
+class UserLogin(BaseUser):
+    pass
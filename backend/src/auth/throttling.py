@@ -0,0 +1,127 @@
+from fastapi import Request
+from redis.exceptions import RedisError
+
+from ipaddress import ip_address, ip_network
+import math
+import time
+import uuid
+
+from cache.utils import redis_client
+from config import settings, logger
+
+THROTTLE_KEY_PREFIX = "auth:throttle"
+
+TRUSTED_PROXIES = [
+    ip_network(network.strip())
+    for network in settings.TRUSTED_PROXIES.split(",")
+    if network.strip()
+]
+
+
+def get_client_ip(request: Request) -> str:
+    """Адрес клиента. X-Real-IP учитывается только от доверенного прокси,
+    иначе заголовок может подставить кто угодно"""
+    peer = request.client.host if request.client else ""
+    try:
+        trusted = any(ip_address(peer) in network for network in TRUSTED_PROXIES)
+    except ValueError:
+        trusted = False
+    if trusted:
+        return request.headers.get("X-Real-IP") or peer
+    return peer
+
+
+class LoginThrottle:
+    def __init__(
+        self,
+        redis,
+        ip_limit: int,
+        ip_window: int,
+        failure_limit: int,
+        failure_window: int,
+        backoff_base: int,
+        backoff_max: int,
+    ):
+        self.redis = redis
+        self.ip_limit = ip_limit
+        self.ip_window = ip_window
+        self.failure_limit = failure_limit
+        self.failure_window = failure_window
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    @staticmethod
+    def _key(kind: str, scope: str, value: str) -> str:
+        return f"{THROTTLE_KEY_PREFIX}:{kind}:{scope}:{value}"
+
+    async def _hit(self, scope: str, value: str, window: int) -> int:
+        key = self._key("window", scope, value)
+        now = time.time()
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zremrangebyscore(key, 0, now - window)
+            pipe.zadd(key, {f"{now}:{uuid.uuid4().hex}": now})
+            pipe.zcard(key)
+            pipe.expire(key, window)
+            _, _, count, _ = await pipe.execute()
+        return count
+
+    async def _block(self, scope: str, value: str) -> int:
+        strikes_key = self._key("strikes", scope, value)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.incr(strikes_key)
+            pipe.expire(strikes_key, self.backoff_max * 2)
+            strikes, _ = await pipe.execute()
+        delay = min(self.backoff_base * 2 ** (strikes - 1), self.backoff_max)
+        await self.redis.set(self._key("block", scope, value), 1, ex=delay)
+        return delay
+
+    async def acquire(self, login: str, ip: str) -> int:
+        """Возвращает число секунд до следующей попытки или 0, если вход разрешён"""
+        login = login.lower()
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.pttl(self._key("block", "login", login))
+                pipe.pttl(self._key("block", "ip", ip))
+                ttls = await pipe.execute()
+            blocked_ms = max(ttls)
+            if blocked_ms > 0:
+                return math.ceil(blocked_ms / 1000)
+
+            if await self._hit("ip", ip, self.ip_window) > self.ip_limit:
+                return await self._block("ip", ip)
+        except RedisError as e:
+            logger.warning(f"Ограничение попыток входа недоступно: {e}")
+        return 0
+
+    async def register_failure(self, login: str) -> None:
+        login = login.lower()
+        try:
+            failures = await self._hit("login", login, self.failure_window)
+            if failures > self.failure_limit:
+                delay = await self._block("login", login)
+                logger.warning(
+                    f"Вход для '{login}' заблокирован на {delay} с после {failures} неудачных попыток"
+                )
+        except RedisError as e:
+            logger.warning(f"Ограничение попыток входа недоступно: {e}")
+
+    async def reset(self, login: str) -> None:
+        login = login.lower()
+        try:
+            await self.redis.delete(
+                self._key("window", "login", login),
+                self._key("strikes", "login", login),
+            )
+        except RedisError as e:
+            logger.warning(f"Ограничение попыток входа недоступно: {e}")
+
+
+login_throttle = LoginThrottle(
+    redis_client,
+    ip_limit=settings.login_ip_limit,
+    ip_window=settings.login_ip_window,
+    failure_limit=settings.login_failure_limit,
+    failure_window=settings.login_failure_window,
+    backoff_base=settings.login_backoff_base,
+    backoff_max=settings.login_backoff_max,
+)
@@ -1,9 +1,16 @@
 from fastapi_cache.coder import Coder
+from redis import asyncio as aioredis
 
 from typing import Any
 import base64
 import json
 
+from config import settings
+
+redis_client = aioredis.from_url(
+    settings.redis_url, encoding="utf8", decode_responses=True
+)
+
 
 class Base64Coder(Coder):
     @classmethod
@@ -1,11 +1,10 @@
-from pydantic import BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from loguru import logger
 import logging
 import os
 import sys
 from pathlib import Path
-from typing import ClassVar
+from typing import ClassVar, Literal, Optional
 
 
 class InterceptHandler(logging.Handler):
@@ -50,11 +49,14 @@ setup_logging()
 
 __all__ = ['logger']
 
-class AuthJWT(BaseModel):
+class AuthJWT(BaseSettings):
     private_key_path: Path = Path(__file__).parent / "certs" / "jwt-private.pem"
     public_key_path: Path = Path(__file__).parent / "certs" / "jwt-public.pem"
-    algorithm: str = "RS256"
+    algorithm: Literal["RS256", "ES256", "EdDSA"] = "RS256"
     access_token_expire_minutes: int = 15
+    verified_token_cache_size: int = 4096
+
+    model_config = SettingsConfigDict(env_prefix="AUTH_JWT_")
 
 class Settings(BaseSettings):
     DB_USER: str
@@ -62,9 +64,28 @@ class Settings(BaseSettings):
     DB_HOST: str
     DB_PORT: int
     DB_NAME: str
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_ECHO: bool = False
+    DB_REPLICA_URL: Optional[str] = None
+    DB_REPLICA_MAX_LAG: float = 5.0
+    DB_CONNECTION_MODE: Literal["direct", "pooler"] = "direct"
+    DB_POOLER_HOST: Optional[str] = None
+    DB_POOLER_PORT: int = 6432
+    DB_STATEMENT_CACHE_SIZE: int = 500
     REDIS_PASSWORD: str
     REDIS_HOST: str = "redis"
     REDIS_PORT: int = 6379
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_BULK_HASH_WORKERS: int = 1
+    EXPORT_WORKERS: int = 2
+    ANALYTICS_ENGINE: bool = False
+    TRUSTED_PROXIES: str = ""
+    METRICS_TOKEN: Optional[str] = None
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -81,14 +102,58 @@ class Settings(BaseSettings):
     log_level: ClassVar[str] = "info"
     auth_jwt: ClassVar[AuthJWT] = AuthJWT()
     cache_ttl: ClassVar[int] = 3600
+    bulk_max_items: ClassVar[int] = 1000
+    principal_cache_ttl: ClassVar[int] = 60
+    replica_health_interval: ClassVar[int] = 5
+    read_your_writes_window: ClassVar[int] = 10
+    login_ip_limit: ClassVar[int] = 20
+    login_ip_window: ClassVar[int] = 60
+    login_failure_limit: ClassVar[int] = 5
+    login_failure_window: ClassVar[int] = 300
+    login_backoff_base: ClassVar[int] = 2
+    login_backoff_max: ClassVar[int] = 900
+    rollup_reconcile_days: ClassVar[int] = 7
+    n_plus_one_threshold: ClassVar[int] = 5
+    stream_batch_size: ClassVar[int] = 500
+    stream_max_batch_size: ClassVar[int] = 5000
+    purge_batch_size: ClassVar[int] = 100
+    purge_batch_pause: ClassVar[float] = 0.2
+    patient_search_threshold: ClassVar[float] = 0.5
+    patient_search_max_limit: ClassVar[int] = 100
+    dashboard_cache_ttl: ClassVar[int] = 60
+    export_max_pending: ClassVar[int] = 4
+    export_worker_nice: ClassVar[int] = 10
+    export_dir: ClassVar[str] = "exports"
+    export_ttl: ClassVar[int] = 3600
+    export_progress_interval: ClassVar[float] = 1.0
+    analytics_refresh_interval: ClassVar[int] = 15
+    analytics_reload_interval: ClassVar[int] = 3600
+    analytics_delta_overlap: ClassVar[int] = 300
+    analytics_max_staleness: ClassVar[int] = 120
+    patient_sketch_rebuild_timeout: ClassVar[int] = 600
     server_ip: ClassVar[str] = "5.129.196.88"
     ssl_server_domain: ClassVar[str] = "https://prirodarazumadev.ru"
     server_domain: ClassVar[str] = "http://prirodarazumadev.ru"
 
+    def get_db_address(self):
+        # Миграции и pg_dump всегда идут напрямую в PostgreSQL,
+        # через пулер подключаются только приложение и Celery задачи
+        if self.DB_CONNECTION_MODE == "pooler":
+            return self.DB_POOLER_HOST or self.DB_HOST, self.DB_POOLER_PORT
+        return self.DB_HOST, self.DB_PORT
+
     def get_db_url(self):
+        host, port = self.get_db_address()
         return (
             f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASSWORD}@"
-            f"{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+            f"{host}:{port}/{self.DB_NAME}"
+        )
+
+    def get_sync_db_url(self):
+        host, port = self.get_db_address()
+        return (
+            f"postgresql+psycopg2://{self.DB_USER}:{self.DB_PASSWORD}@"
+            f"{host}:{port}/{self.DB_NAME}"
         )
 
 settings = Settings()
\ No newline at end of file
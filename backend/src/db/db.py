@@ -1,5 +1,21 @@
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from datetime import datetime
-from sqlalchemy import Integer, func
+from functools import lru_cache, wraps
+from typing import (
+    AsyncGenerator,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterator,
+    List,
+    Optional,
+)
+from uuid import uuid4
+import time
+
+from sqlalchemy import Engine, Executable, Integer, create_engine, event, func
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.ext.asyncio import (
     AsyncAttrs,
     AsyncSession,
@@ -9,24 +25,208 @@ from sqlalchemy.ext.asyncio import (
 )
 from sqlalchemy.orm import (
     DeclarativeBase,
+    ORMExecuteState,
+    Session,
     declared_attr,
     Mapped,
     mapped_column,
+    with_loader_criteria,
 )
 
+from fastapi import Request
+
 from config import settings
+from .replica import ReplicaRouter, has_recent_write, mark_recent_write
 
 DATABASE_URL = settings.get_db_url()
 
-engine: AsyncEngine = create_async_engine(DATABASE_URL, echo=True)
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Пул соединений, запоминающий время ожидания выдачи соединения"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        record = super()._do_get()
+        record.info["checkout_wait"] = time.perf_counter() - started
+        return record
+
+
+def get_connect_args(mode: str) -> dict:
+    """Параметры asyncpg для режима подключения.
+
+    В режиме pooler (PgBouncer в режиме транзакций) серверное соединение
+    меняется между транзакциями, поэтому кэш подготовленных выражений
+    отключается, а имена выражений делаются уникальными, чтобы не
+    конфликтовать с выражениями других клиентов на том же соединении.
+    """
+    if mode == "pooler":
+        return {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+    return {"prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE}
+
+
+def create_db_engine(url: str, mode: str = settings.DB_CONNECTION_MODE) -> AsyncEngine:
+    return create_async_engine(
+        url,
+        echo=settings.DB_ECHO,
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args=get_connect_args(mode),
+    )
+
+
+engine: AsyncEngine = create_db_engine(DATABASE_URL)
 
 async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
 
+replica_engine: Optional[AsyncEngine] = (
+    create_db_engine(settings.DB_REPLICA_URL) if settings.DB_REPLICA_URL else None
+)
+
+replica_session_maker = (
+    async_sessionmaker(replica_engine, expire_on_commit=False)
+    if replica_engine is not None
+    else None
+)
+
+@lru_cache
+def get_sync_engine() -> Engine:
+    """Синхронный движок для Celery задач, создаётся в процессе воркера"""
+    return create_engine(
+        settings.get_sync_db_url(),
+        pool_size=2,
+        max_overflow=0,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
+
+
+def dispose_sync_engine() -> None:
+    """Закрывает соединения синхронного движка при остановке процесса"""
+    if get_sync_engine.cache_info().currsize:
+        get_sync_engine().dispose()
+        get_sync_engine.cache_clear()
+
+
+replica_router = ReplicaRouter(
+    replica_engine, settings.DB_REPLICA_MAX_LAG, settings.replica_health_interval
+)
+
+
+_current_session: ContextVar[Optional[AsyncSession]] = ContextVar(
+    "current_session", default=None
+)
+
+
+@asynccontextmanager
+async def session_scope(
+    session_maker: async_sessionmaker = async_session_maker,
+) -> AsyncIterator[AsyncSession]:
+    """Единица работы: вложенные вызовы присоединяются к уже открытой сессии,
+    внешний вызов фиксирует транзакцию при выходе"""
+    session = _current_session.get()
+    if session is not None:
+        yield session
+        return
+
+    async with session_maker() as session:
+        token = _current_session.set(session)
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            _current_session.reset(token)
+
+    for callback in session.info.pop("on_commit", []):
+        await callback()
+
+
+async def on_commit(callback: Callable[[], Awaitable[None]]) -> None:
+    """Выполняет callback после фиксации текущей единицы работы, вне её - сразу.
+
+    Сброс кэшей до фиксации оставляет окно, в котором параллельный запрос
+    прочитает старую строку и снова положит её в кэш. При откате callback
+    не выполняется.
+    """
+    session = _current_session.get()
+    if session is None:
+        await callback()
+    else:
+        session.info.setdefault("on_commit", []).append(callback)
+
+
+async def get_read_session_maker(user_id: Optional[int] = None) -> async_sessionmaker:
+    if not await replica_router.is_available():
+        return async_session_maker
+    if user_id is not None and await has_recent_write(user_id):
+        return async_session_maker
+    return replica_session_maker
+
+
+async def stream_query(
+    query: Executable,
+    batch_size: int = settings.stream_batch_size,
+    session_maker: async_sessionmaker = async_session_maker,
+    scalars: bool = True,
+) -> AsyncIterator[List]:
+    """Читает результат серверным курсором пачками по batch_size строк.
+
+    Сессия открывается на время итерации, а не берётся из запроса: тело
+    StreamingResponse отправляется уже после закрытия сессии запроса.
+    """
+    async with session_maker() as session:
+        query = query.execution_options(yield_per=batch_size)
+        if scalars:
+            result = await session.stream_scalars(query)
+        else:
+            result = await session.stream(query)
+        async for batch in result.partitions():
+            yield batch
 
-async def get_async_session() -> AsyncSession:
-    async with async_session_maker() as session:
+
+def stream_query_sync(
+    query: Executable, batch_size: int = settings.stream_batch_size
+) -> Iterator[List]:
+    """Синхронный вариант stream_query для процессов выгрузки и Celery задач"""
+    with Session(get_sync_engine()) as session:
+        result = session.execute(query.execution_options(yield_per=batch_size))
+        yield from result.partitions()
+
+
+async def get_async_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """Единица работы запроса: все репозитории внутри обработчика используют
+    одну сессию и транзакцию.
+
+    Открывается после get_current_user: по пользователю выбирается реплика
+    или основная БД (чтение своих записей). Поэтому поиск пользователя при
+    промахе кэша в неё не входит и выполняется отдельной короткой сессией
+    основной БД - реплика могла бы вернуть ещё активного пользователя.
+    """
+    principal = getattr(request.state, "principal", None)
+    user_id = principal.id if principal is not None else None
+    read_only = request.method in ("GET", "HEAD")
+
+    if read_only:
+        session_maker = await get_read_session_maker(user_id)
+    else:
+        session_maker = async_session_maker
+
+    async with session_scope(session_maker) as session:
         yield session
 
+    if not read_only and user_id is not None and replica_engine is not None:
+        await mark_recent_write(user_id)
+
 
 class Base(AsyncAttrs, DeclarativeBase):
     __abstract__ = True
@@ -42,15 +242,34 @@ class Base(AsyncAttrs, DeclarativeBase):
         return cls.__name__.lower() + "s"
 
 
+class SoftDeleteMixin:
+    """Строки с deleted_at скрыты от всех ORM запросов, физически их удаляет
+    задача tasks.purge_deleted"""
+
+    deleted_at: Mapped[Optional[datetime]] = mapped_column(nullable=True)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _hide_soft_deleted(execute_state: ORMExecuteState):
+    if not (execute_state.is_select or execute_state.is_update):
+        return
+    if execute_state.is_column_load or execute_state.is_relationship_load:
+        return
+    if execute_state.execution_options.get("include_deleted", False):
+        return
+    execute_state.statement = execute_state.statement.options(
+        with_loader_criteria(
+            SoftDeleteMixin,
+            lambda cls: cls.deleted_at.is_(None),
+            include_aliases=True,
+        )
+    )
+
+
 def connection(method):
+    @wraps(method)
     async def wrapper(*args, **kwargs):
-        async with async_session_maker() as session:
-            try:
-                return await method(*args, session=session, **kwargs)
-            except Exception as e:
-                await session.rollback()
-                raise e
-            finally:
-                await session.close()
+        async with session_scope() as session:
+            return await method(*args, session=session, **kwargs)
 
     return wrapper
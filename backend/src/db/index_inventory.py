@@ -0,0 +1,261 @@
+"""Реестр горячих запросов и индексов, которые их обслуживают.
+
+Проверка в CI:
+    python -m db.index_inventory            # индексы объявлены в моделях
+    python -m db.index_inventory --explain  # запросы обслуживаются индексами в БД
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, List, Set
+import argparse
+import asyncio
+import sys
+
+from sqlalchemy import Select, Table, UniqueConstraint, func, select, text
+from sqlalchemy.dialects.postgresql import asyncpg
+
+from db.db import Base, async_session_maker
+from db.time_window import TimeWindow
+from models.models import (
+    DailyDocumentStat,
+    DailyPatientActivity,
+    DailyUserStat,
+    Document,
+    Patient,
+    SubDirectories,
+    User,
+)
+from repositories.patients import search_query
+
+SAMPLE_WINDOW = TimeWindow.last_days(30, now=datetime(2024, 1, 31))
+
+
+@dataclass(frozen=True)
+class HotQuery:
+    name: str
+    table: str
+    index: str
+    build: Callable[[], Select]
+
+
+HOT_QUERIES: List[HotQuery] = [
+    HotQuery(
+        "UserRepository.get_by_name / login",
+        "users",
+        "ix_users_login",
+        lambda: select(User).where(User.login == "admin123"),
+    ),
+    HotQuery(
+        "UserRepository.get_by_email",
+        "users",
+        "users_email_key",
+        lambda: select(User).where(User.email == "admin@example.com"),
+    ),
+    HotQuery(
+        "BaseRepository.get_by_id / get_current_user",
+        "users",
+        "users_pkey",
+        lambda: select(User).where(User.id == 1),
+    ),
+    HotQuery(
+        "Удаление роли (каскад на users.role_id)",
+        "users",
+        "ix_users_role_id",
+        lambda: select(User.id).where(User.role_id == 1),
+    ),
+    HotQuery(
+        "Сверка daily_user_stats",
+        "users",
+        "ix_users_created_at",
+        lambda: select(func.count(User.id)).where(
+            SAMPLE_WINDOW.filter(User.created_at)
+        ),
+    ),
+    HotQuery(
+        "BaseRepository.get_by_id (patients)",
+        "patients",
+        "patients_pkey",
+        lambda: select(Patient).where(Patient.id == 1),
+    ),
+    HotQuery(
+        "Новые пациенты за час (метрики)",
+        "patients",
+        "ix_patients_created_at_brin",
+        lambda: select(func.count(Patient.id)).where(
+            TimeWindow.last_hours(1, now=SAMPLE_WINDOW.end).filter(Patient.created_at)
+        ),
+    ),
+    HotQuery(
+        "PatientRepository.search",
+        "patients",
+        "ix_patients_fio_trgm",
+        lambda: search_query("Иванов").limit(20),
+    ),
+    HotQuery(
+        "Patient.get_documents_by_directory",
+        "documents",
+        "ix_documents_patient_id_subdirectory_type",
+        lambda: select(Document.id)
+        .where(
+            Document.patient_id == 1,
+            Document.subdirectory_type == SubDirectories.DIAGNOSTICS,
+        )
+        .order_by(Document.created_at.desc()),
+    ),
+    HotQuery(
+        "Удаление пациента (каскад на documents.patient_id)",
+        "documents",
+        "ix_documents_patient_id_subdirectory_type",
+        lambda: select(Document.id).where(Document.patient_id == 1),
+    ),
+    HotQuery(
+        "Документы пользователя за период",
+        "documents",
+        "ix_documents_author_id_created_at",
+        lambda: select(func.count(Document.id)).where(
+            Document.author_id == 1, SAMPLE_WINDOW.filter(Document.created_at)
+        ),
+    ),
+    HotQuery(
+        "Сверка daily_document_stats / daily_patient_activity",
+        "documents",
+        "ix_documents_created_at_brin",
+        lambda: select(func.count(Document.id)).where(
+            SAMPLE_WINDOW.filter(Document.created_at)
+        ),
+    ),
+    HotQuery(
+        "Очистка удалённых документов (tasks.purge_deleted)",
+        "documents",
+        "ix_documents_deleted_at",
+        lambda: select(Document.id).where(Document.deleted_at.is_not(None)).limit(100),
+    ),
+    HotQuery(
+        "Очистка удалённых пациентов (tasks.purge_deleted)",
+        "patients",
+        "ix_patients_deleted_at",
+        lambda: select(Patient.id).where(Patient.deleted_at.is_not(None)).limit(100),
+    ),
+    HotQuery(
+        "Аналитика документов и разделов",
+        "daily_document_stats",
+        "uq_daily_document_stats",
+        lambda: select(
+            DailyDocumentStat.day, func.sum(DailyDocumentStat.documents_count)
+        )
+        .where(SAMPLE_WINDOW.filter_days(DailyDocumentStat.day))
+        .group_by(DailyDocumentStat.day),
+    ),
+    HotQuery(
+        "Аналитика пациентов",
+        "daily_patient_activity",
+        "uq_daily_patient_activity",
+        lambda: select(DailyPatientActivity.day, func.count())
+        .where(SAMPLE_WINDOW.filter_days(DailyPatientActivity.day))
+        .group_by(DailyPatientActivity.day),
+    ),
+    HotQuery(
+        "Аналитика пользователей и ролей",
+        "daily_user_stats",
+        "uq_daily_user_stats",
+        lambda: select(DailyUserStat.day, func.sum(DailyUserStat.users_count))
+        .where(SAMPLE_WINDOW.filter_days(DailyUserStat.day))
+        .group_by(DailyUserStat.day),
+    ),
+]
+
+
+def declared_indexes(table: Table) -> Set[str]:
+    """Имена индексов таблицы, включая неявные индексы PK и UNIQUE"""
+    names = {index.name for index in table.indexes}
+    if table.primary_key.columns:
+        names.add(f"{table.name}_pkey")
+    for constraint in table.constraints:
+        if isinstance(constraint, UniqueConstraint):
+            columns = "_".join(c.name for c in constraint.columns)
+            names.add(constraint.name or f"{table.name}_{columns}_key")
+    return names
+
+
+def leading_columns(table: Table) -> Set[str]:
+    columns = {c.name for c in table.primary_key.columns}
+    for index in table.indexes:
+        columns.add(index.expressions[0].name)
+    for constraint in table.constraints:
+        if isinstance(constraint, UniqueConstraint):
+            columns.add(list(constraint.columns)[0].name)
+    return columns
+
+
+def check_declared() -> List[str]:
+    problems = []
+    tables = Base.metadata.tables
+
+    for query in HOT_QUERIES:
+        if query.index not in declared_indexes(tables[query.table]):
+            problems.append(f"{query.name}: индекс {query.index} не объявлен")
+
+    for table in tables.values():
+        leading = leading_columns(table)
+        for fk in table.foreign_keys:
+            if fk.parent.name not in leading:
+                problems.append(
+                    f"{table.name}.{fk.parent.name}: внешний ключ без индекса"
+                )
+
+    return problems
+
+
+def compile_query(query: Select) -> str:
+    return str(
+        query.compile(
+            dialect=asyncpg.dialect(), compile_kwargs={"literal_binds": True}
+        )
+    )
+
+
+async def check_plans() -> List[str]:
+    """Проверяет, что у каждого запроса есть пригодный индекс.
+
+    Seq scan отключается, поэтому он остаётся в плане, только если ни один
+    индекс не подходит. Выбор между несколькими индексами зависит от
+    статистики, поэтому расхождение с ожидаемым индексом только выводится.
+    """
+    problems = []
+    async with async_session_maker() as session:
+        await session.execute(text("SET LOCAL enable_seqscan = off"))
+        for query in HOT_QUERIES:
+            plan = "\n".join(
+                (
+                    await session.execute(
+                        text(f"EXPLAIN {compile_query(query.build())}")
+                    )
+                ).scalars()
+            )
+            if f"Seq Scan on {query.table}" in plan:
+                problems.append(f"{query.name}: нет пригодного индекса\n{plan}")
+            elif query.index not in plan:
+                print(f"{query.name}: план использует другой индекс вместо {query.index}")
+        await session.rollback()
+    return problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--explain", action="store_true", help="проверить планы запросов в БД"
+    )
+    args = parser.parse_args()
+
+    problems = check_declared()
+    if args.explain:
+        problems += asyncio.run(check_plans())
+
+    for problem in problems:
+        print(problem, file=sys.stderr)
+    print(f"Проверено запросов: {len(HOT_QUERIES)}, проблем: {len(problems)}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
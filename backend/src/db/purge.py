@@ -0,0 +1,54 @@
+"""Физическое удаление помеченных строк (мягкое удаление).
+
+Каждая пачка удаляется в отдельной короткой транзакции, чтобы не держать
+блокировки и не порождать большой объём WAL разом. SKIP LOCKED позволяет
+нескольким запускам идти параллельно без ожидания друг друга.
+"""
+from typing import Dict
+import time
+
+from sqlalchemy import Engine, text
+
+PURGE_STATEMENTS = {
+    "documents": text(
+        """
+        DELETE FROM documents
+        WHERE id IN (
+            SELECT id FROM documents
+            WHERE deleted_at IS NOT NULL
+            LIMIT :batch_size
+            FOR UPDATE SKIP LOCKED
+        )
+        """
+    ),
+    # Пациент удаляется после всех своих документов, иначе каскад внешнего
+    # ключа снова удалил бы их одной транзакцией
+    "patients": text(
+        """
+        DELETE FROM patients
+        WHERE id IN (
+            SELECT p.id FROM patients p
+            WHERE p.deleted_at IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM documents d WHERE d.patient_id = p.id)
+            LIMIT :batch_size
+            FOR UPDATE SKIP LOCKED
+        )
+        """
+    ),
+}
+
+
+def purge_deleted(engine: Engine, batch_size: int, pause: float) -> Dict[str, int]:
+    """Удаляет помеченные строки пачками по batch_size с паузой между ними"""
+    purged = {}
+    for table, statement in PURGE_STATEMENTS.items():
+        purged[table] = 0
+        while True:
+            with engine.begin() as conn:
+                conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+                deleted = conn.execute(statement, {"batch_size": batch_size}).rowcount
+            purged[table] += deleted
+            if deleted < batch_size:
+                break
+            time.sleep(pause)
+    return purged
@@ -0,0 +1,79 @@
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from redis.exceptions import RedisError
+
+from typing import Optional
+import asyncio
+import time
+
+from cache.utils import redis_client
+from config import settings, logger
+
+RECENT_WRITE_KEY_PREFIX = "db:recent_write"
+
+REPLICA_LAG_QUERY = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """
+)
+
+
+class ReplicaRouter:
+    def __init__(
+        self, engine: Optional[AsyncEngine], max_lag: float, check_interval: int
+    ):
+        self.engine = engine
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._available = False
+        self._checked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def _check(self) -> bool:
+        try:
+            async with asyncio.timeout(1):
+                async with self.engine.connect() as conn:
+                    lag = (await conn.execute(REPLICA_LAG_QUERY)).scalar()
+        except Exception as e:
+            logger.warning(f"Реплика базы данных недоступна: {e}")
+            return False
+
+        if lag > self.max_lag:
+            logger.warning(f"Отставание реплики {lag:.1f} с превышает допустимое")
+            return False
+        return True
+
+    async def is_available(self) -> bool:
+        if self.engine is None:
+            return False
+        if time.monotonic() < self._checked_until:
+            return self._available
+
+        async with self._lock:
+            if time.monotonic() >= self._checked_until:
+                self._available = await self._check()
+                self._checked_until = time.monotonic() + self.check_interval
+        return self._available
+
+
+async def mark_recent_write(user_id: int) -> None:
+    try:
+        await redis_client.set(
+            f"{RECENT_WRITE_KEY_PREFIX}:{user_id}",
+            1,
+            ex=settings.read_your_writes_window,
+        )
+    except RedisError as e:
+        logger.warning(f"Не удалось отметить запись пользователя {user_id}: {e}")
+
+
+async def has_recent_write(user_id: int) -> bool:
+    try:
+        return bool(await redis_client.exists(f"{RECENT_WRITE_KEY_PREFIX}:{user_id}"))
+    except RedisError as e:
+        logger.warning(f"Не удалось проверить записи пользователя {user_id}: {e}")
+        return True
@@ -0,0 +1,114 @@
+"""Сверка дневных агрегатов с исходными таблицами.
+
+Агрегаты поддерживаются триггерами (миграция 0003_daily_rollups), сверка
+исправляет расхождения после ручных правок, восстановления бэкапов и
+отключённых триггеров.
+"""
+from datetime import date
+from typing import Dict, Optional
+
+from sqlalchemy import Connection, text
+
+RECONCILE_STATEMENTS = {
+    "daily_document_stats": (
+        text(
+            """
+            INSERT INTO daily_document_stats AS s
+                (day, author_id, subdirectory_type, documents_count)
+            SELECT created_at::date, author_id, subdirectory_type, count(*)
+            FROM documents
+            WHERE created_at >= :since AND deleted_at IS NULL
+            GROUP BY 1, 2, 3
+            ON CONFLICT (day, author_id, subdirectory_type) DO UPDATE
+            SET documents_count = EXCLUDED.documents_count, updated_at = now()
+            WHERE s.documents_count <> EXCLUDED.documents_count
+            """
+        ),
+        text(
+            """
+            DELETE FROM daily_document_stats s
+            WHERE s.day >= :since
+              AND NOT EXISTS (
+                SELECT 1 FROM documents d
+                WHERE d.deleted_at IS NULL
+                  AND d.created_at >= s.day
+                  AND d.created_at < s.day + 1
+                  AND d.author_id IS NOT DISTINCT FROM s.author_id
+                  AND d.subdirectory_type = s.subdirectory_type
+              )
+            """
+        ),
+    ),
+    "daily_patient_activity": (
+        text(
+            """
+            INSERT INTO daily_patient_activity AS s (day, patient_id, documents_count)
+            SELECT created_at::date, patient_id, count(*)
+            FROM documents
+            WHERE created_at >= :since AND deleted_at IS NULL
+            GROUP BY 1, 2
+            ON CONFLICT (day, patient_id) DO UPDATE
+            SET documents_count = EXCLUDED.documents_count, updated_at = now()
+            WHERE s.documents_count <> EXCLUDED.documents_count
+            """
+        ),
+        text(
+            """
+            DELETE FROM daily_patient_activity s
+            WHERE s.day >= :since
+              AND NOT EXISTS (
+                SELECT 1 FROM documents d
+                WHERE d.deleted_at IS NULL
+                  AND d.created_at >= s.day
+                  AND d.created_at < s.day + 1
+                  AND d.patient_id = s.patient_id
+              )
+            """
+        ),
+    ),
+    "daily_user_stats": (
+        text(
+            """
+            INSERT INTO daily_user_stats AS s (day, role_id, users_count)
+            SELECT created_at::date, role_id, count(*)
+            FROM users
+            WHERE created_at >= :since
+            GROUP BY 1, 2
+            ON CONFLICT (day, role_id) DO UPDATE
+            SET users_count = EXCLUDED.users_count, updated_at = now()
+            WHERE s.users_count <> EXCLUDED.users_count
+            """
+        ),
+        text(
+            """
+            DELETE FROM daily_user_stats s
+            WHERE s.day >= :since
+              AND NOT EXISTS (
+                SELECT 1 FROM users u
+                WHERE u.created_at >= s.day
+                  AND u.created_at < s.day + 1
+                  AND u.role_id = s.role_id
+              )
+            """
+        ),
+    ),
+}
+
+
+def reconcile_rollups(connection: Connection, since: Optional[date]) -> Dict[str, int]:
+    """Пересчитывает агрегаты начиная с since (None - за всё время).
+
+    Таблицы-источники блокируются от записи на время сверки, иначе
+    параллельная вставка, учтённая триггером, может быть затёрта
+    пересчитанным значением.
+    """
+    since = since or date.min
+    connection.execute(text("SET LOCAL lock_timeout = '10s'"))
+    connection.execute(text("LOCK TABLE documents, users IN SHARE MODE"))
+
+    corrected = {}
+    for table, (upsert, delete_stale) in RECONCILE_STATEMENTS.items():
+        upserted = connection.execute(upsert, {"since": since}).rowcount
+        deleted = connection.execute(delete_stale, {"since": since}).rowcount
+        corrected[table] = upserted + deleted
+    return corrected
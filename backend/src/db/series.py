@@ -0,0 +1,78 @@
+"""Временные ряды по дневным агрегатам с группировкой по дням, неделям и месяцам.
+
+Интервалы строит generate_series, данные присоединяются LEFT JOIN, поэтому
+пустые интервалы заполняются нулями в БД: ряд за 5 лет по месяцам - это
+60 строк результата, а не словарь на 1825 дней в Python.
+"""
+from typing import Literal, get_args
+
+from sqlalchemy import (
+    ColumnElement,
+    Date,
+    DateTime,
+    Select,
+    Subquery,
+    cast,
+    func,
+    literal,
+    select,
+)
+from sqlalchemy.dialects.postgresql import INTERVAL
+
+from .time_window import TimeWindow
+
+Granularity = Literal["day", "week", "month"]
+GRANULARITIES = get_args(Granularity)
+
+
+def bucket(granularity: Granularity, day) -> ColumnElement:
+    """Начало интервала (неделя с понедельника) для даты или колонки date.
+
+    Приведение к timestamp выбирает date_trunc без часового пояса, иначе
+    date приводится к timestamptz и границы зависят от TimeZone сессии.
+    """
+    return func.date_trunc(granularity, cast(day, DateTime))
+
+
+def buckets_subquery(window: TimeWindow, granularity: Granularity) -> Subquery:
+    """Начала всех интервалов, пересекающихся с окном"""
+    return select(
+        func.generate_series(
+            bucket(granularity, literal(window.start_date, Date)),
+            cast(literal(window.end_date, Date) - 1, DateTime),
+            cast(literal(f"1 {granularity}"), INTERVAL),
+        ).label("bucket")
+    ).subquery("buckets")
+
+
+def series_query(
+    window: TimeWindow,
+    granularity: Granularity,
+    day_column,
+    value: ColumnElement,
+    *criteria: ColumnElement[bool],
+) -> Select:
+    """Ряд (date, value) по интервалам окна, пустые интервалы со значением 0.
+
+    day_column - колонка date агрегата, value - агрегатная функция над ним.
+    Первый и последний интервалы могут быть неполными: в них попадают только
+    дни окна, а date - начало интервала.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Неизвестная группировка: {granularity}")
+
+    data = (
+        select(bucket(granularity, day_column).label("bucket"), value.label("value"))
+        .where(window.filter_days(day_column), *criteria)
+        .group_by("bucket")
+        .subquery("data")
+    )
+    buckets = buckets_subquery(window, granularity)
+    return (
+        select(
+            cast(buckets.c.bucket, Date).label("date"),
+            func.coalesce(data.c.value, 0).label("value"),
+        )
+        .select_from(buckets.outerjoin(data, data.c.bucket == buckets.c.bucket))
+        .order_by(buckets.c.bucket)
+    )
@@ -0,0 +1,64 @@
+"""Временные окна для аналитических запросов.
+
+Фильтр строится как полуинтервал column >= start AND column < end без
+функций над колонкой, поэтому запрос может использовать btree и BRIN
+индексы по created_at.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional
+
+from sqlalchemy import ColumnElement, and_
+
+
+@dataclass(frozen=True)
+class TimeWindow:
+    start: datetime
+    end: datetime
+
+    @classmethod
+    def last_days(cls, days: int, now: Optional[datetime] = None) -> "TimeWindow":
+        """Последние days календарных дней, включая сегодняшний"""
+        today = (now or datetime.now()).date()
+        start = datetime.combine(today - timedelta(days=days - 1), time.min)
+        return cls(start, datetime.combine(today + timedelta(days=1), time.min))
+
+    @classmethod
+    def between(cls, first: date, last: date) -> "TimeWindow":
+        """Дни с first по last включительно"""
+        return cls(
+            datetime.combine(first, time.min),
+            datetime.combine(last + timedelta(days=1), time.min),
+        )
+
+    @classmethod
+    def last_hours(cls, hours: int, now: Optional[datetime] = None) -> "TimeWindow":
+        now = now or datetime.now()
+        return cls(now - timedelta(hours=hours), now)
+
+    @property
+    def start_date(self) -> date:
+        return self.start.date()
+
+    @property
+    def end_date(self) -> date:
+        return self.end.date()
+
+    @property
+    def days(self) -> int:
+        return (self.end_date - self.start_date).days
+
+    def dates(self) -> List[date]:
+        """Дни окна по порядку, для заполнения пропусков нулями"""
+        return [
+            self.start_date + timedelta(days=i)
+            for i in range(self.days)
+        ]
+
+    def filter(self, column) -> ColumnElement[bool]:
+        """Условие для колонки timestamp"""
+        return and_(column >= self.start, column < self.end)
+
+    def filter_days(self, column) -> ColumnElement[bool]:
+        """Условие для колонки date (дневные агрегаты)"""
+        return and_(column >= self.start_date, column < self.end_date)
@@ -1,9 +1,8 @@
 from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
 from sqlalchemy import select
-import bcrypt
 import os
 from models.models import User, Role
-from auth.utils import hash_password
+from auth.utils import hash_password_async
 from config import logger
 
 async def init_db(engine: AsyncEngine):
@@ -35,7 +34,7 @@ async def init_db(engine: AsyncEngine):
                 return
             
             admin_password = "admin123"
-            hashed_password = hash_password(admin_password)
+            hashed_password = await hash_password_async(admin_password)
             admin = User(
                 login=admin_login,
                 password=hashed_password,
@@ -1,18 +1,25 @@
 from prometheus_client import Counter, Gauge, Histogram, generate_latest
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import func, select, text
-from fastapi import Request
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy import event, func, select, text
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.responses import PlainTextResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from influxdb_client import InfluxDBClient
 from influxdb_client.client.write_api import SYNCHRONOUS
 import psutil
 
-from datetime import datetime, timedelta
+from collections import Counter as StatementCounter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Optional
 import asyncio
+import secrets
 import time
 
-from models.models import User, Document, Patient, Role
-from config import logger
+from models.models import DailyDocumentStat, DailyUserStat, Patient, Role, User
+from config import logger, settings
+from db.time_window import TimeWindow
 
 INFLUX_SETTINGS = {
     "url": "http://localhost:8086",
@@ -60,12 +67,56 @@ DOCUMENTS_BY_TYPE = Counter(
 
 DB_ACTIVE_CONNECTIONS = Gauge("db_active_connections", "Active database connections")
 
+DB_POOL_SIZE = Gauge("db_pool_size", "Configured database pool size", ["engine"])
+
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "Database connections currently in use", ["engine"]
+)
+
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow", "Database connections opened above the pool size", ["engine"]
+)
+
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled database connection",
+    ["engine"],
+    buckets=[0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30],
+)
+
 DB_RESPONSE_TIME = Histogram(
     "db_query_duration_seconds",
     "Database query duration distribution",
     buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1],
 )
 
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request",
+    "SQL statements executed per HTTP request",
+    ["method", "route"],
+    buckets=[0, 1, 2, 3, 5, 10, 20, 50, 100],
+)
+
+DB_TIME_PER_REQUEST = Histogram(
+    "db_time_per_request_seconds",
+    "Total SQL execution time per HTTP request",
+    ["method", "route"],
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5],
+)
+
+DB_ROWS_PER_REQUEST = Histogram(
+    "db_rows_per_request",
+    "Rows returned or affected by SQL statements per HTTP request",
+    ["method", "route"],
+    buckets=[0, 1, 10, 100, 1000, 10000, 100000],
+)
+
+DB_REPEATED_STATEMENTS = Counter(
+    "db_repeated_statements",
+    "HTTP requests repeating the same SQL statement (likely N+1)",
+    ["method", "route"],
+)
+
 APP_HEALTH = Gauge(
     "app_health", "Application health status (1 = healthy, 0 = unhealthy)"
 )
@@ -104,6 +155,105 @@ CPU_USAGE = Gauge(
 )
 
 
+def instrument_engine_pool(engine: AsyncEngine, name: str = "primary"):
+    sync_engine = engine.sync_engine
+
+    DB_POOL_SIZE.labels(engine=name).set_function(lambda: sync_engine.pool.size())
+    DB_POOL_CHECKED_OUT.labels(engine=name).set_function(
+        lambda: sync_engine.pool.checkedout()
+    )
+    DB_POOL_OVERFLOW.labels(engine=name).set_function(
+        lambda: max(sync_engine.pool.overflow(), 0)
+    )
+
+    @event.listens_for(sync_engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        wait = connection_record.info.pop("checkout_wait", None)
+        if wait is not None:
+            DB_POOL_CHECKOUT_WAIT.labels(engine=name).observe(wait)
+
+
+@dataclass
+class QueryStats:
+    """SQL запросы, выполненные в рамках одного HTTP запроса"""
+
+    count: int = 0
+    duration: float = 0.0
+    rows: int = 0
+    statements: StatementCounter = field(default_factory=StatementCounter)
+
+    def record(self, statement: str, duration: float, rows: int):
+        self.count += 1
+        self.duration += duration
+        self.rows += rows
+        self.statements[statement] += 1
+
+    def repeated(self) -> Dict[str, int]:
+        return {
+            statement: count
+            for statement, count in self.statements.items()
+            if count >= settings.n_plus_one_threshold
+        }
+
+    def summary(self) -> str:
+        return (
+            f"count={self.count}; time_ms={self.duration * 1000:.1f}; "
+            f"rows={self.rows}; repeated={len(self.repeated())}"
+        )
+
+
+_query_stats: ContextVar[Optional[QueryStats]] = ContextVar(
+    "query_stats", default=None
+)
+
+
+def instrument_engine_queries(engine: AsyncEngine):
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context.query_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = _query_stats.get()
+        if stats is not None:
+            stats.record(
+                statement,
+                time.perf_counter() - context.query_started,
+                max(cursor.rowcount, 0),
+            )
+
+
+async def track_db_queries(request: Request, call_next):
+    """Привязывает SQL запросы к маршруту и отдаёт сводку по заголовку X-Debug-Queries"""
+    stats = QueryStats()
+    token = _query_stats.set(stats)
+    try:
+        response = await call_next(request)
+    finally:
+        _query_stats.reset(token)
+
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    labels = {"method": request.method, "route": route}
+    DB_QUERIES_PER_REQUEST.labels(**labels).observe(stats.count)
+    DB_TIME_PER_REQUEST.labels(**labels).observe(stats.duration)
+    DB_ROWS_PER_REQUEST.labels(**labels).observe(stats.rows)
+
+    repeated = stats.repeated()
+    if repeated:
+        DB_REPEATED_STATEMENTS.labels(**labels).inc()
+        for statement, count in repeated.items():
+            logger.warning(
+                f"Возможный N+1 в {request.method} {route}: запрос выполнен "
+                f"{count} раз: {' '.join(statement.split())[:300]}"
+            )
+
+    if request.headers.get("X-Debug-Queries"):
+        response.headers["X-DB-Queries"] = stats.summary()
+    return response
+
+
 async def update_metrics(session: AsyncSession):
     try:
         start_time = time.time()
@@ -177,7 +327,7 @@ async def update_metrics(session: AsyncSession):
 
         new_patients = await session.execute(
             select(func.count(Patient.id)).where(
-                Patient.created_at >= datetime.now() - timedelta(hours=1)
+                TimeWindow.last_hours(1).filter(Patient.created_at)
             )
         )
         new_patients_count = new_patients.scalar()
@@ -215,7 +365,9 @@ async def update_metrics(session: AsyncSession):
                 )
 
         roles = await session.execute(
-            select(Role.name, func.count(User.id)).join(User).group_by(Role.name)
+            select(Role.name, func.sum(DailyUserStat.users_count))
+            .join(DailyUserStat, Role.id == DailyUserStat.role_id)
+            .group_by(Role.name)
         )
         for role_name, count in roles:
             await write_influx_point(
@@ -223,17 +375,20 @@ async def update_metrics(session: AsyncSession):
             )
             USERS_BY_ROLE.labels(role_name=role_name).set(count)
 
-        total_docs = await session.execute(select(func.count(Document.id)))
-        total_docs_count = total_docs.scalar()
+        total_docs = await session.execute(
+            select(func.sum(DailyDocumentStat.documents_count))
+        )
+        total_docs_count = total_docs.scalar() or 0
         await write_influx_point(
             "documents", {"total": total_docs_count}, {"type": "all"}
         )
         DOCUMENTS_TOTAL.set(total_docs_count)
 
         docs_by_type = await session.execute(
-            select(Document.subdirectory_type, func.count(Document.id)).group_by(
-                Document.subdirectory_type
-            )
+            select(
+                DailyDocumentStat.subdirectory_type,
+                func.sum(DailyDocumentStat.documents_count),
+            ).group_by(DailyDocumentStat.subdirectory_type)
         )
         for doc_type, count in docs_by_type:
             await write_influx_point(
@@ -247,5 +402,25 @@ async def update_metrics(session: AsyncSession):
         raise
 
 
+metrics_bearer = HTTPBearer(auto_error=False)
+
+
+def require_metrics_token(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(metrics_bearer),
+):
+    """Статический токен Prometheus: JWT администратора живёт 15 минут и для
+    сбора метрик не подходит. Без METRICS_TOKEN эндпоинт выключен"""
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    if credentials is None or not secrets.compare_digest(
+        credentials.credentials.encode(), settings.METRICS_TOKEN.encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Неверный токен метрик",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
 def get_metrics(request: Request):
     return PlainTextResponse(generate_latest(), media_type="text/plain")
@@ -6,9 +6,15 @@ from sqlalchemy import (
     Boolean,
     Date,
     Enum as SQLAlchemyEnum,
+    Index,
+    UniqueConstraint,
+    cast,
     event,
+    func,
+    text,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship, validates
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from typing import Optional, List
@@ -16,7 +22,7 @@ from datetime import date
 from enum import Enum
 import re
 
-from db.db import Base
+from db.db import Base, SoftDeleteMixin
 
 
 class SubDirectories(str, Enum):
@@ -28,6 +34,18 @@ class SubDirectories(str, Enum):
 
 
 class User(Base):
+    __table_args__ = (
+        Index("ix_users_login", "login", unique=True),
+        Index("ix_users_role_id", "role_id"),
+        Index("ix_users_created_at", "created_at"),
+        Index(
+            "ix_users_fio_trgm",
+            "fio",
+            postgresql_using="gin",
+            postgresql_ops={"fio": "gin_trgm_ops"},
+        ),
+    )
+
     fio: Mapped[str] = mapped_column(String(255), nullable=False)
     login: Mapped[str] = mapped_column(String(50), nullable=False)
     password: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
@@ -117,7 +135,28 @@ class Role(Base):
         return value
 
 
-class Document(Base):
+class Document(SoftDeleteMixin, Base):
+    __table_args__ = (
+        Index(
+            "ix_documents_patient_id_subdirectory_type",
+            "patient_id",
+            "subdirectory_type",
+            "created_at",
+        ),
+        Index("ix_documents_author_id_created_at", "author_id", "created_at"),
+        Index(
+            "ix_documents_created_at_brin",
+            "created_at",
+            postgresql_using="brin",
+            postgresql_with={"autosummarize": "on"},
+        ),
+        Index(
+            "ix_documents_deleted_at",
+            "deleted_at",
+            postgresql_where=text("deleted_at IS NOT NULL"),
+        ),
+    )
+
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     data: Mapped[bytes] = mapped_column(LargeBinary)
 
@@ -157,7 +196,27 @@ class Document(Base):
         return document
 
 
-class Patient(Base):
+class Patient(SoftDeleteMixin, Base):
+    __table_args__ = (
+        Index(
+            "ix_patients_created_at_brin",
+            "created_at",
+            postgresql_using="brin",
+            postgresql_with={"autosummarize": "on"},
+        ),
+        Index(
+            "ix_patients_deleted_at",
+            "deleted_at",
+            postgresql_where=text("deleted_at IS NOT NULL"),
+        ),
+        Index(
+            "ix_patients_fio_trgm",
+            "fio",
+            postgresql_using="gin",
+            postgresql_ops={"fio": "gin_trgm_ops"},
+        ),
+    )
+
     fio: Mapped[str] = mapped_column(String(255), nullable=False)
     date_of_birth: Mapped[date] = mapped_column(Date, nullable=False)
 
@@ -207,7 +266,7 @@ class Patient(Base):
         result = await session.execute(query)
         return result.scalars().all()
 
-    @property
+    @hybrid_property
     def age(self) -> int:
         today = date.today()
         return (
@@ -219,6 +278,57 @@ class Patient(Base):
             )
         )
 
+    @age.inplace.expression
+    @classmethod
+    def _age_expression(cls):
+        return cast(func.date_part("year", func.age(cls.date_of_birth)), Integer)
+
+
+class DailyDocumentStat(Base):
+    """Дневной агрегат документов, поддерживается триггером rollup_documents"""
+
+    __tablename__ = "daily_document_stats"
+    __table_args__ = (
+        UniqueConstraint(
+            "day",
+            "author_id",
+            "subdirectory_type",
+            name="uq_daily_document_stats",
+            postgresql_nulls_not_distinct=True,
+        ),
+    )
+
+    day: Mapped[date] = mapped_column(Date, nullable=False)
+    author_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    subdirectory_type: Mapped[SubDirectories] = mapped_column(
+        SQLAlchemyEnum(SubDirectories), nullable=False
+    )
+    documents_count: Mapped[int] = mapped_column(Integer, nullable=False)
+
+
+class DailyPatientActivity(Base):
+    """Пациенты с документами за день, поддерживается триггером rollup_documents"""
+
+    __tablename__ = "daily_patient_activity"
+    __table_args__ = (
+        UniqueConstraint("day", "patient_id", name="uq_daily_patient_activity"),
+    )
+
+    day: Mapped[date] = mapped_column(Date, nullable=False)
+    patient_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    documents_count: Mapped[int] = mapped_column(Integer, nullable=False)
+
+
+class DailyUserStat(Base):
+    """Дневной агрегат пользователей, поддерживается триггером rollup_users"""
+
+    __tablename__ = "daily_user_stats"
+    __table_args__ = (UniqueConstraint("day", "role_id", name="uq_daily_user_stats"),)
+
+    day: Mapped[date] = mapped_column(Date, nullable=False)
+    role_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    users_count: Mapped[int] = mapped_column(Integer, nullable=False)
+
 
 @event.listens_for(Patient, "after_insert")
 def create_default_subdirectories(mapper, connection, target):
@@ -7,37 +7,41 @@ export PGPASSWORD=$DB_PASSWORD
 echo "Текущая директория: $(pwd)"
 echo "Содержимое текущей директории: $(ls -la)"
 
-if [ ! -d "./certs" ]; then
-    echo "Создание папки certs и генерация JWT ключей..."
-    mkdir -p ./certs
-    cd ./certs
-    openssl genrsa -out jwt-private.pem 2048
-    openssl rsa -in jwt-private.pem -outform PEM -pubout -out jwt-public.pem
-    chmod 600 jwt-private.pem  
-    cd ..
+JWT_ALGORITHM=${AUTH_JWT_ALGORITHM:-RS256}
+JWT_PRIVATE_KEY=${AUTH_JWT_PRIVATE_KEY_PATH:-./certs/jwt-private.pem}
+JWT_PUBLIC_KEY=${AUTH_JWT_PUBLIC_KEY_PATH:-./certs/jwt-public.pem}
+
+if [ ! -f "$JWT_PRIVATE_KEY" ]; then
+    echo "Генерация JWT ключей для алгоритма $JWT_ALGORITHM..."
+    mkdir -p "$(dirname "$JWT_PRIVATE_KEY")" "$(dirname "$JWT_PUBLIC_KEY")"
+    case "$JWT_ALGORITHM" in
+        ES256)
+            openssl genpkey -algorithm EC -pkeyopt ec_paramgen_curve:P-256 -out "$JWT_PRIVATE_KEY"
+            ;;
+        EdDSA)
+            openssl genpkey -algorithm ed25519 -out "$JWT_PRIVATE_KEY"
+            ;;
+        *)
+            openssl genrsa -out "$JWT_PRIVATE_KEY" 2048
+            ;;
+    esac
+    openssl pkey -in "$JWT_PRIVATE_KEY" -pubout -out "$JWT_PUBLIC_KEY"
+    chmod 600 "$JWT_PRIVATE_KEY"
 else
-    echo "Папка certs уже существует, пропуск генерации ключей"
-    echo "Содержимое папки certs: $(ls -la ./certs)"
+    echo "JWT ключи уже существуют, пропуск генерации ключей"
+    echo "Содержимое папки certs: $(ls -la "$(dirname "$JWT_PRIVATE_KEY")")"
 fi
 
-if [ ! -f "./certs/jwt-private.pem" ] || [ ! -f "./certs/jwt-public.pem" ]; then
-    echo "ОШИБКА: Отсутствуют файлы ключей в папке certs!" >&2
+if [ ! -f "$JWT_PRIVATE_KEY" ] || [ ! -f "$JWT_PUBLIC_KEY" ]; then
+    echo "ОШИБКА: Отсутствуют файлы ключей JWT!" >&2
     exit 1
 fi
 
-echo "Проверка структуры директорий Alembic..."
-if [ ! -d "./alembic" ]; then
-    echo "ПРЕДУПРЕЖДЕНИЕ: Папка alembic не существует, создаю..."
-    mkdir -p ./alembic/versions
-fi
-
-if [ ! -d "./alembic/versions" ]; then
-    echo "ПРЕДУПРЕЖДЕНИЕ: Папка alembic/versions не существует, создаю..."
-    mkdir -p ./alembic/versions
+if [ -z "$(ls ./alembic/versions/*.py 2>/dev/null)" ]; then
+    echo "ОШИБКА: В alembic/versions нет файлов миграций!" >&2
+    exit 1
 fi
 
-echo "Содержимое папки alembic: $(ls -la ./alembic)"
-
 echo "Ожидание PostgreSQL..."
 until pg_isready -h $DB_HOST -p 5432 -U $DB_USER -d $DB_NAME -t 1; do
     sleep 2
@@ -45,45 +49,28 @@ done
 
 echo "Проверка состояния миграций..."
 
-if ! psql -h $DB_HOST -U $DB_USER -d $DB_NAME -tAc "SELECT EXISTS (SELECT 1 FROM information_schema.tables WHERE table_name = 'alembic_version')" | grep -q t; then
-    echo "Таблица alembic_version не существует. Инициализация базы данных..."
-    echo "Создание начальной миграции..."
-    alembic revision --autogenerate -m "initial"
-    echo "Применение миграций..."
-    alembic upgrade head
-    echo "Миграции успешно применены"
-else
+HAS_SCHEMA=$(psql -h $DB_HOST -U $DB_USER -d $DB_NAME -tAc "SELECT to_regclass('public.users') IS NOT NULL")
+HAS_VERSION_TABLE=$(psql -h $DB_HOST -U $DB_USER -d $DB_NAME -tAc "SELECT to_regclass('public.alembic_version') IS NOT NULL")
+
+CURRENT_VERSION=""
+if [ "$HAS_VERSION_TABLE" = "t" ]; then
     CURRENT_VERSION=$(psql -h $DB_HOST -U $DB_USER -d $DB_NAME -tAc "SELECT version_num FROM alembic_version LIMIT 1")
-    
-    if [ -z "$CURRENT_VERSION" ]; then
-        echo "Таблица alembic_version пуста. Создание и применение миграции..."
-        alembic revision --autogenerate -m "initial"
-        alembic upgrade head
-    else
-        VERSIONS_DIR="alembic/versions"
-        VERSION_FILE=$(find $VERSIONS_DIR -name "*${CURRENT_VERSION}*" -type f 2>/dev/null)
-        
-        if [ -z "$VERSION_FILE" ]; then
-            echo "Версия миграции $CURRENT_VERSION не найдена в файлах."
-            echo "Содержимое директории миграций: $(ls -la $VERSIONS_DIR)"
-            
-            echo "Очистка таблицы alembic_version и создание новой миграции..."
-            psql -h $DB_HOST -U $DB_USER -d $DB_NAME -c "DELETE FROM alembic_version"
-            
-            echo "Создание новой начальной миграции..."
-            alembic revision --autogenerate -m "initial"
-            echo "Применение миграции..."
-            alembic upgrade head
-        else
-            echo "Файл миграции для версии $CURRENT_VERSION найден: $VERSION_FILE"
-            echo "Применение миграций..."
-            alembic upgrade head
-        fi
+fi
+
+# Базы, созданные до появления версионированных миграций, содержат схему
+# из автосгенерированной миграции. Она совпадает с 0001_initial, поэтому
+# версия фиксируется, а индексы и остальные изменения накатываются upgrade.
+if [ "$HAS_SCHEMA" = "t" ]; then
+    if [ -z "$CURRENT_VERSION" ] || ! grep -rqs "revision: str = \"$CURRENT_VERSION\"" ./alembic/versions; then
+        echo "Версия схемы '$CURRENT_VERSION' неизвестна, фиксация базовой версии 0001_initial..."
+        alembic stamp --purge 0001_initial
     fi
-    
-    echo "Миграции успешно проверены/применены"
 fi
 
+echo "Применение миграций..."
+alembic upgrade head
+echo "Миграции успешно применены"
+
 unset PGPASSWORD
 
 echo "Ожидание RabbitMQ..."
@@ -101,6 +88,14 @@ done
 echo "Запуск Celery worker в фоновом режиме..."
 celery -A tasks.tasks.celery worker --loglevel=info --detach
 
+echo "Запуск Celery worker очереди maintenance в фоновом режиме..."
+celery -A tasks.tasks.celery worker -Q maintenance -n maintenance@%h --concurrency=1 --loglevel=info --detach \
+    --pidfile=/tmp/celery-maintenance.pid --logfile=/tmp/celery-maintenance.log
+
+echo "Запуск Celery worker очереди exports в фоновом режиме..."
+nice -n 10 celery -A tasks.tasks.celery worker -Q exports -n exports@%h --concurrency=${EXPORT_WORKERS:-2} --loglevel=info --detach \
+    --pidfile=/tmp/celery-exports.pid --logfile=/tmp/celery-exports.log
+
 echo "Запуск Celery beat в фоновом режиме..."
 celery -A tasks.tasks.celery beat --loglevel=info --detach
 
@@ -0,0 +1,89 @@
+"""Выгрузка XLSX в отдельных процессах.
+
+openpyxl формирует файл в Python коде и занимает процессор на всё время
+выгрузки, поэтому в потоке приложения он останавливал бы обработку всех
+запросов. Файлы строятся в пуле процессов с пониженным приоритетом, одновременно
+выполняется не больше EXPORT_WORKERS выгрузок и ждёт не больше
+export_max_pending, остальные запросы сразу получают отказ.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+import asyncio
+import atexit
+import multiprocessing
+import os
+import tempfile
+
+from config import settings, logger
+from db.db import dispose_sync_engine, stream_query_sync
+from db.time_window import TimeWindow
+from .registry import build_report
+from .writers import write_xlsx
+
+
+class ExportQueueFull(Exception):
+    pass
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_slots = asyncio.Semaphore(settings.EXPORT_WORKERS + settings.export_max_pending)
+
+
+def _init_worker():
+    os.nice(settings.export_worker_nice)
+    atexit.register(dispose_sync_engine)
+
+
+def get_export_executor() -> ProcessPoolExecutor:
+    # spawn, а не fork: дочерний процесс не должен наследовать соединения
+    # и цикл событий приложения
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.EXPORT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+    return _executor
+
+
+def shutdown_export_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def build_xlsx_file(
+    report_type: str,
+    days: Optional[int],
+    user_id: Optional[int],
+    batch_size: int = settings.stream_batch_size,
+) -> str:
+    """Выполняется в процессе пула, возвращает путь к временному файлу"""
+    window = TimeWindow.last_days(days) if days else None
+    report, query = build_report(report_type, window, user_id)
+
+    fd, path = tempfile.mkstemp(prefix=f"{report_type}_", suffix=".xlsx")
+    os.close(fd)
+    try:
+        rows = write_xlsx(path, report.headers, stream_query_sync(query, batch_size))
+    except Exception:
+        os.unlink(path)
+        raise
+    logger.info(f"Отчёт {report_type} выгружен в XLSX, строк: {rows}")
+    return path
+
+
+async def run_export(func, *args):
+    if _slots.locked():
+        raise ExportQueueFull()
+    async with _slots:
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(get_export_executor(), func, *args)
+        except BrokenProcessPool:
+            logger.error("Процесс выгрузки аварийно завершился, пул пересоздаётся")
+            shutdown_export_executor()
+            raise
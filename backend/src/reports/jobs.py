@@ -0,0 +1,131 @@
+"""Фоновая выгрузка отчётов в файлы (задача tasks.export_report).
+
+Файл пишется во временный *.part и переименовывается после записи, поэтому
+скачивание никогда не отдаёт недописанный файл. Файлы живут export_ttl
+секунд, столько же, сколько результат задачи в Celery.
+"""
+from datetime import date
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Literal, Optional, Sequence
+import os
+import time
+
+from sqlalchemy import Select, func, select
+from sqlalchemy.orm import Session
+
+from config import settings, logger
+from db.db import get_sync_engine, stream_query_sync
+from db.time_window import TimeWindow
+from .arrow import report_schema, write_arrow, write_parquet
+from .registry import build_report
+from .writers import write_csv, write_xlsx
+
+ExportFormat = Literal["csv", "xlsx", "parquet", "arrow"]
+
+MEDIA_TYPES: Dict[str, str] = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+}
+
+EXPORT_DIR = Path(settings.export_dir)
+
+
+def export_path(task_id: str, export_format: str) -> Path:
+    return EXPORT_DIR / f"{task_id}.{export_format}"
+
+
+def count_rows(query: Select) -> int:
+    with Session(get_sync_engine()) as session:
+        return session.scalar(
+            select(func.count()).select_from(query.order_by(None).subquery())
+        )
+
+
+def track_progress(
+    batches: Iterator[List],
+    total: int,
+    on_progress: Callable[[int, int], None],
+) -> Iterator[List]:
+    """Сообщает о прогрессе не чаще export_progress_interval секунд"""
+    rows = 0
+    reported_at = time.monotonic()
+    for batch in batches:
+        yield batch
+        rows += len(batch)
+        if time.monotonic() - reported_at >= settings.export_progress_interval:
+            on_progress(rows, total)
+            reported_at = time.monotonic()
+
+
+def write_report(
+    path: str,
+    export_format: str,
+    query: Select,
+    headers: Sequence[str],
+    batches: Iterator[List],
+) -> int:
+    if export_format == "csv":
+        return write_csv(path, headers, batches)
+    if export_format == "xlsx":
+        return write_xlsx(path, headers, batches)
+    if export_format == "parquet":
+        return write_parquet(path, report_schema(query, headers), batches)
+    if export_format == "arrow":
+        return write_arrow(path, report_schema(query, headers), batches)
+    raise ValueError(f"Неизвестный формат выгрузки: {export_format}")
+
+
+def run_export_job(
+    task_id: str,
+    report_type: str,
+    export_format: str,
+    date_from: Optional[date],
+    date_to: Optional[date],
+    user_id: Optional[int],
+    on_progress: Callable[[int, int], None],
+) -> Dict[str, int]:
+    window = TimeWindow.between(date_from, date_to) if date_from else None
+    report, query = build_report(report_type, window, user_id)
+    total = count_rows(query)
+    on_progress(0, total)
+
+    EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+    path = export_path(task_id, export_format)
+    part = path.with_name(path.name + ".part")
+    try:
+        rows = write_report(
+            str(part),
+            export_format,
+            query,
+            report.headers,
+            track_progress(
+                stream_query_sync(query, settings.stream_max_batch_size),
+                total,
+                on_progress,
+            ),
+        )
+        os.replace(part, path)
+    except Exception:
+        part.unlink(missing_ok=True)
+        raise
+
+    logger.info(f"Отчёт {report_type} выгружен в {path}, строк: {rows}")
+    return {"rows": rows, "size": path.stat().st_size}
+
+
+def cleanup_exports(max_age: int = settings.export_ttl) -> int:
+    """Удаляет файлы выгрузок старше max_age секунд, включая брошенные *.part"""
+    if not EXPORT_DIR.exists():
+        return 0
+    removed = 0
+    deadline = time.time() - max_age
+    for path in EXPORT_DIR.iterdir():
+        try:
+            if path.is_file() and path.stat().st_mtime < deadline:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
@@ -0,0 +1,222 @@
+"""Отчёты для экспорта: заголовки колонок и запрос, строки которого
+записываются в файл как есть.
+
+Агрегированные отчёты читают дневные агрегаты и требуют период.
+Построчные отчёты (records) выгружают записи целиком, могут содержать
+миллионы строк и читаются серверным курсором; период для них необязателен.
+"""
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import (
+    Integer,
+    Select,
+    String,
+    and_,
+    cast,
+    column,
+    distinct,
+    func,
+    select,
+    values,
+)
+
+from db.series import series_query
+from db.time_window import TimeWindow
+from models.models import (
+    DailyDocumentStat,
+    DailyPatientActivity,
+    DailyUserStat,
+    Document,
+    Patient,
+    Role,
+    SubDirectories,
+    User,
+)
+
+
+@dataclass(frozen=True)
+class Report:
+    headers: Tuple[str, ...]
+    build: Callable[[Optional[TimeWindow], Optional[int]], Select]
+    records: bool = False
+    needs_user: bool = False
+
+
+def roles_query(window: TimeWindow, user_id: Optional[int]) -> Select:
+    return (
+        select(Role.name, func.sum(DailyUserStat.users_count))
+        .join(DailyUserStat, Role.id == DailyUserStat.role_id)
+        .where(window.filter_days(DailyUserStat.day))
+        .group_by(Role.name)
+        .order_by(Role.name)
+    )
+
+
+def subdirectories_query(window: TimeWindow, user_id: Optional[int]) -> Select:
+    """Все разделы в порядке перечисления, разделы без документов с нулём"""
+    subdirectories = values(
+        column("position", Integer),
+        column("name", String),
+        column("label", String),
+        name="subdirectories",
+    ).data(
+        [
+            (position, subdirectory.name, subdirectory.value)
+            for position, subdirectory in enumerate(SubDirectories)
+        ]
+    )
+    data = (
+        select(
+            cast(DailyDocumentStat.subdirectory_type, String).label("name"),
+            func.sum(DailyDocumentStat.documents_count).label("count"),
+        )
+        .where(window.filter_days(DailyDocumentStat.day))
+        .group_by(DailyDocumentStat.subdirectory_type)
+        .subquery("data")
+    )
+    return (
+        select(subdirectories.c.label, func.coalesce(data.c.count, 0))
+        .select_from(
+            subdirectories.outerjoin(data, data.c.name == subdirectories.c.name)
+        )
+        .order_by(subdirectories.c.position)
+    )
+
+
+def patients_query(window: TimeWindow, user_id: Optional[int]) -> Select:
+    return series_query(
+        window,
+        "day",
+        DailyPatientActivity.day,
+        func.count(distinct(DailyPatientActivity.patient_id)),
+    )
+
+
+def users_query(window: TimeWindow, user_id: Optional[int]) -> Select:
+    return series_query(
+        window, "day", DailyUserStat.day, func.sum(DailyUserStat.users_count)
+    )
+
+
+def user_documents_query(window: TimeWindow, user_id: Optional[int]) -> Select:
+    return series_query(
+        window,
+        "day",
+        DailyDocumentStat.day,
+        func.sum(DailyDocumentStat.documents_count),
+        DailyDocumentStat.author_id == user_id,
+    )
+
+
+def document_records_query(window: Optional[TimeWindow], user_id: Optional[int]) -> Select:
+    """Метаданные документов без содержимого файла"""
+    query = (
+        select(
+            Document.id,
+            Document.name,
+            Document.subdirectory_type,
+            Patient.id,
+            Patient.fio,
+            User.fio,
+            Document.created_at,
+        )
+        .join(Patient, Document.patient_id == Patient.id)
+        .outerjoin(User, Document.author_id == User.id)
+        .order_by(Document.id)
+    )
+    if window is not None:
+        query = query.where(window.filter(Document.created_at))
+    if user_id is not None:
+        query = query.where(Document.author_id == user_id)
+    return query
+
+
+def patient_records_query(window: Optional[TimeWindow], user_id: Optional[int]) -> Select:
+    query = select(
+        Patient.id, Patient.fio, Patient.date_of_birth, Patient.created_at
+    ).order_by(Patient.id)
+    if window is not None:
+        query = query.where(window.filter(Patient.created_at))
+    return query
+
+
+def user_activity_query(window: Optional[TimeWindow], user_id: Optional[int]) -> Select:
+    """Пользователи с количеством и датой последнего загруженного документа"""
+    documents_join = Document.author_id == User.id
+    if window is not None:
+        documents_join = and_(documents_join, window.filter(Document.created_at))
+    query = (
+        select(
+            User.id,
+            User.fio,
+            User.login,
+            Role.name,
+            User.active,
+            func.count(Document.id),
+            func.max(Document.created_at),
+        )
+        .join(Role, User.role_id == Role.id)
+        .outerjoin(Document, documents_join)
+        .group_by(User.id, Role.name)
+        .order_by(User.id)
+    )
+    if user_id is not None:
+        query = query.where(User.id == user_id)
+    return query
+
+
+REPORTS: Dict[str, Report] = {
+    "roles": Report(("Роль", "Количество"), roles_query),
+    "documents": Report(("Категория", "Количество"), subdirectories_query),
+    "patients": Report(("Дата", "Количество пациентов"), patients_query),
+    "users": Report(("Дата", "Количество пользователей"), users_query),
+    "user-documents": Report(
+        ("Дата", "Количество документов"), user_documents_query, needs_user=True
+    ),
+    "document-records": Report(
+        (
+            "ID документа",
+            "Название",
+            "Категория",
+            "ID пациента",
+            "ФИО пациента",
+            "Автор",
+            "Дата загрузки",
+        ),
+        document_records_query,
+        records=True,
+    ),
+    "patient-records": Report(
+        ("ID пациента", "ФИО", "Дата рождения", "Дата создания"),
+        patient_records_query,
+        records=True,
+    ),
+    "user-activity": Report(
+        (
+            "ID пользователя",
+            "ФИО",
+            "Логин",
+            "Роль",
+            "Активен",
+            "Загружено документов",
+            "Последний документ",
+        ),
+        user_activity_query,
+        records=True,
+    ),
+}
+
+
+def build_report(
+    report_type: str, window: Optional[TimeWindow], user_id: Optional[int]
+) -> Tuple[Report, Select]:
+    """Проверяет параметры отчёта и строит его запрос, ошибки - ValueError"""
+    report = REPORTS.get(report_type)
+    if report is None:
+        raise ValueError("Неверный формат отчета")
+    if window is None and not report.records:
+        raise ValueError("Для агрегированного отчёта необходим период")
+    if report.needs_user and not user_id:
+        raise ValueError("Необходим ID Пользователя")
+    return report, report.build(window, user_id)
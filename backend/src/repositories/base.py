@@ -1,10 +1,14 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, TypeVar, Generic
+from collections import defaultdict
+from typing import Any, AsyncIterator, Iterable, List, Dict, Optional, TypeVar, Generic
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import update, delete
-from db.db import connection
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy import Integer, Select, any_, bindparam, column, delete, func, insert, update, values
+from db.db import async_session_maker, connection, stream_query
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import load_only, sessionmaker
+from config import settings
 
 T = TypeVar("T")
 D = TypeVar("D")
@@ -48,6 +52,41 @@ class BaseRepository(IRepository, Generic[D]):
         result = await session.execute(select(self.model))
         return result.scalars().all()
 
+    def rows_query(self, fields: Iterable[str]) -> Select:
+        """Выборка только полей схемы чтения в виде строк, без ORM объектов.
+        Вычисляемые поля берутся из SQL выражений гибридных свойств модели"""
+        return select(*(getattr(self.model, name).label(name) for name in fields))
+
+    @connection
+    async def get_all_rows(
+        self, fields: Iterable[str], session: AsyncSession
+    ) -> List[Dict[str, Any]]:
+        result = await session.execute(self.rows_query(fields))
+        keys = list(result.keys())
+        return [dict(zip(keys, row)) for row in result]
+
+    async def stream_all(
+        self,
+        batch_size: int = settings.stream_batch_size,
+        fields: Optional[Iterable[str]] = None,
+        session_maker: async_sessionmaker = async_session_maker,
+    ) -> AsyncIterator[List[D]]:
+        """Все сущности пачками через серверный курсор.
+
+        fields ограничивает загружаемые колонки (например, без содержимого
+        файлов), неизвестные имена и вычисляемые поля пропускаются.
+        """
+        query = select(self.model).order_by(self.model.id)
+        if fields is not None:
+            columns = self.model.__table__.columns
+            query = query.options(
+                load_only(
+                    *(getattr(self.model, name) for name in fields if name in columns)
+                )
+            )
+        async for batch in stream_query(query, batch_size, session_maker):
+            yield batch
+
     @connection
     async def create(self, data: Dict, session: AsyncSession) -> D:
         if hasattr(data, "model_dump"):
@@ -55,9 +94,86 @@ class BaseRepository(IRepository, Generic[D]):
 
         model_instance = self.model(**data)
         session.add(model_instance)
-        await session.commit()
+        await session.flush()
         return model_instance
 
+    def apply_model_rules(self, item: Dict) -> Dict:
+        """Проверки @validates модели для элемента пачки: Core INSERT и UPDATE
+        их не вызывают. Как и создание объекта, бросает ValueError"""
+        data = {key: value for key, value in item.items() if key != "id"}
+        obj = self.model(**data)
+        return {**item, **{key: getattr(obj, key) for key in data}}
+
+    def unique_columns(self) -> List:
+        table = self.model.__table__
+        columns = [column for column in table.columns if column.unique]
+        columns += [
+            next(iter(index.columns))
+            for index in table.indexes
+            if index.unique and len(index.columns) == 1
+        ]
+        return list(dict.fromkeys(columns))
+
+    @connection
+    async def find_conflicts(
+        self, items: List[Dict], session: AsyncSession
+    ) -> Dict[int, str]:
+        """Позиции элементов пачки, которые нарушили бы ограничения таблицы,
+        с описанием причины: повтор уникального значения внутри пачки или с
+        другой строкой, ссылка на несуществующую запись"""
+        table = self.model.__table__
+        conflicts = {}
+        for unique_column in self.unique_columns():
+            positions = self._positions_by_value(items, unique_column.name)
+            if not positions:
+                continue
+            detail = f"Значение поля {unique_column.name} уже занято"
+
+            for duplicates in positions.values():
+                for position in duplicates[1:]:
+                    conflicts.setdefault(position, detail)
+
+            # Помеченные удалёнными строки тоже занимают уникальные значения
+            result = await session.execute(
+                select(table.c.id, unique_column)
+                .where(unique_column.in_(list(positions)))
+                .execution_options(include_deleted=True)
+            )
+            for obj_id, value in result:
+                for position in positions[value]:
+                    if items[position].get("id") != obj_id:
+                        conflicts.setdefault(position, detail)
+
+        for foreign_key in table.foreign_keys:
+            positions = self._positions_by_value(items, foreign_key.parent.name)
+            if not positions:
+                continue
+            target = foreign_key.column
+            existing = set(
+                await session.scalars(
+                    select(target)
+                    .where(target.in_(list(positions)))
+                    .execution_options(include_deleted=True)
+                )
+            )
+            for value, missing in positions.items():
+                if value not in existing:
+                    for position in missing:
+                        conflicts.setdefault(
+                            position,
+                            f"Запись для поля {foreign_key.parent.name} не найдена",
+                        )
+        return conflicts
+
+    @staticmethod
+    def _positions_by_value(items: List[Dict], name: str) -> Dict[Any, List[int]]:
+        positions = defaultdict(list)
+        for position, item in enumerate(items):
+            value = item.get(name)
+            if value is not None:
+                positions[value].append(position)
+        return positions
+
     @connection
     async def get_by_id(self, obj_id: int, session: AsyncSession) -> D:
         result = await session.execute(
@@ -83,16 +199,85 @@ class BaseRepository(IRepository, Generic[D]):
         )
 
         result = await session.execute(stmt)
-        await session.commit()
-
         return result.scalar_one_or_none()
 
     @connection
     async def delete(self, obj_id: int, session: AsyncSession) -> bool:
-        result = await self.get_by_id(obj_id)
-        if not result:
-            return False
+        result = await session.execute(
+            delete(self.model).where(self.model.id == obj_id).returning(self.model.id)
+        )
+        return result.scalar_one_or_none() is not None
+
+    @connection
+    async def bulk_create(self, items: List[Dict], session: AsyncSession) -> List[D]:
+        if not items:
+            return []
+
+        result = await session.scalars(
+            insert(self.model).returning(self.model, sort_by_parameter_order=True),
+            items,
+        )
+        return result.all()
 
-        await session.execute(delete(self.model).where(self.model.id == obj_id))
-        await session.commit()
-        return True
+    @connection
+    async def bulk_update(self, items: List[Dict], session: AsyncSession) -> List[D]:
+        table = self.model.__table__
+        groups = defaultdict(list)
+        for item in items:
+            groups[tuple(sorted(key for key in item if key != "id"))].append(item)
+
+        updated = []
+        for fields, group in groups.items():
+            if not fields:
+                continue
+
+            names = ("id", *fields)
+            data = values(
+                *(column(name, table.c[name].type) for name in names), name="data"
+            ).data([tuple(item[name] for name in names) for item in group])
+
+            stmt = (
+                update(self.model)
+                .where(self.model.id == data.c.id)
+                .values({name: data.c[name] for name in fields})
+                .returning(self.model)
+                .execution_options(synchronize_session=False)
+            )
+            result = await session.scalars(stmt)
+            updated.extend(result.all())
+
+        return updated
+
+    @connection
+    async def bulk_delete(self, ids: List[int], session: AsyncSession) -> List[int]:
+        if not ids:
+            return []
+
+        result = await session.execute(
+            delete(self.model)
+            .where(self.model.id == any_(bindparam("ids", ids, type_=ARRAY(Integer))))
+            .returning(self.model.id)
+        )
+        return list(result.scalars().all())
+
+
+class SoftDeleteRepository(BaseRepository[D]):
+    """Удаление только помечает строки, поэтому не зависит от объёма данных.
+    Строки и содержимое файлов удаляет фоновая задача tasks.purge_deleted"""
+
+    async def delete(self, obj_id: int) -> bool:
+        return bool(await self.bulk_delete([obj_id]))
+
+    @connection
+    async def bulk_delete(self, ids: List[int], session: AsyncSession) -> List[int]:
+        if not ids:
+            return []
+
+        result = await session.execute(
+            update(self.model)
+            .where(self.model.id == any_(bindparam("ids", ids, type_=ARRAY(Integer))))
+            .values(deleted_at=func.now())
+            .returning(self.model.id)
+            .execution_options(synchronize_session=False)
+        )
+        return list(result.scalars().all())
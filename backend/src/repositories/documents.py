@@ -1,7 +1,7 @@
 from models.models import Document
-from .base import BaseRepository
+from .base import SoftDeleteRepository
 
 
-class DocumentRepository(BaseRepository):
+class DocumentRepository(SoftDeleteRepository):
     def __init__(self):
         super().__init__(Document)
@@ -1,7 +1,75 @@
-from models.models import Patient
-from .base import BaseRepository
+from datetime import date
+from typing import List, Optional, Tuple
 
+from sqlalchemy import Integer, Select, any_, bindparam, func, or_, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
 
-class PatientRepository(BaseRepository):
+from config import settings
+from db.db import connection
+from models.models import Document, Patient
+from .base import SoftDeleteRepository
+
+
+def search_query(
+    query: str, born_from: Optional[date] = None, born_to: Optional[date] = None
+) -> Select:
+    """Пациенты, у которых ФИО содержит query или похоже на него по словам,
+    по убыванию сходства. Оба условия обслуживает индекс ix_patients_fio_trgm"""
+    pattern = "%{}%".format(
+        query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    )
+    score = func.word_similarity(query, Patient.fio).label("score")
+    stmt = select(Patient, score).where(
+        or_(Patient.fio.ilike(pattern), Patient.fio.op("%>")(query))
+    )
+    if born_from is not None:
+        stmt = stmt.where(Patient.date_of_birth >= born_from)
+    if born_to is not None:
+        stmt = stmt.where(Patient.date_of_birth <= born_to)
+    return stmt.order_by(score.desc(), Patient.fio, Patient.id)
+
+
+class PatientRepository(SoftDeleteRepository):
     def __init__(self):
         super().__init__(Patient)
+
+    @connection
+    async def bulk_delete(self, ids: List[int], session: AsyncSession) -> List[int]:
+        """Помечает пациентов удалёнными вместе с их документами"""
+        deleted = await super().bulk_delete(ids)
+        if deleted:
+            await session.execute(
+                update(Document)
+                .where(
+                    Document.patient_id
+                    == any_(bindparam("ids", deleted, type_=ARRAY(Integer)))
+                )
+                .values(deleted_at=func.now())
+                .execution_options(synchronize_session=False)
+            )
+        return deleted
+
+    @connection
+    async def search(
+        self,
+        query: str,
+        born_from: Optional[date],
+        born_to: Optional[date],
+        limit: int,
+        offset: int,
+        session: AsyncSession,
+    ) -> List[Tuple[Patient, float]]:
+        await session.execute(
+            select(
+                func.set_config(
+                    "pg_trgm.word_similarity_threshold",
+                    str(settings.patient_search_threshold),
+                    True,
+                )
+            )
+        )
+        result = await session.execute(
+            search_query(query, born_from, born_to).limit(limit).offset(offset)
+        )
+        return [(patient, score) for patient, score in result.all()]
@@ -4,23 +4,44 @@ from fastapi import (
     HTTPException,
     Path,
     Query,
+    Request,
     status,
 )
 from fastapi_cache.decorator import cache
-from sqlalchemy import func, select
+from celery.result import AsyncResult
+from sqlalchemy import distinct, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi.responses import StreamingResponse
-import pandas as pd
-
-from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
-import csv
-import io
-
-from db.db import get_async_session
-from models.models import Document, Patient, User, Role, SubDirectories
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from redis.exceptions import RedisError
+
+from datetime import date, timedelta
+from typing import List, Dict, Any, Literal, Optional, Tuple
+import asyncio
+import os
+
+from analytics.engine import analytics_engine
+from analytics.sketches import claim_rebuild, count_unique_patients
+from db.db import async_session_maker, get_async_session, get_read_session_maker
+from db.series import Granularity, series_query
+from db.time_window import TimeWindow
+from reports.export import ExportQueueFull, build_xlsx_file, run_export
+from reports.arrow import arrow_chunks, parquet_chunks
+from reports.jobs import MEDIA_TYPES, export_path
+from reports.registry import build_report
+from reports.writers import csv_chunks
+from models.models import (
+    DailyDocumentStat,
+    DailyPatientActivity,
+    DailyUserStat,
+    Role,
+    SubDirectories,
+)
 from config import settings, logger
-from cache.utils import Base64Coder
+from cache.utils import Base64Coder, redis_client
+from schemas.analytics import DashboardResponse, ExportJobCreate, ExportJobResponse
+from tasks.tasks import celery, export_report, rebuild_patient_sketches
+from auth.schema import Principal
 from .base import custom_key_builder
 from auth.auth import require_role
 
@@ -29,42 +50,53 @@ router = APIRouter(prefix="/statistics", tags=["statistics"])
 _max_amount_of_days: int = 365 * 5
 
 
-async def get_documents_stats(
-    days: int, user_id: int = None, session: AsyncSession = Depends(get_async_session)
-) -> List[Dict[str, Any]]:
-    try:
-        if days < 1 or days > _max_amount_of_days:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Аргумент 'Дни' должен лежать в пределах 1 и {_max_amount_of_days}",
-            )
-
-        today = datetime.now().date()
-        start_date = today - timedelta(days=days - 1)
-
-        query = (
-            select(
-                func.date(Document.created_at).label("date"),
-                func.count().label("count"),
-            )
-            .where(func.date(Document.created_at) >= start_date)
-            .group_by(func.date(Document.created_at))
-            .order_by(func.date(Document.created_at))
+def get_range_window(date_from: date, date_to: date) -> TimeWindow:
+    if date_from > date_to:
+        raise HTTPException(
+            status_code=400, detail="Начало периода не может быть позже его конца"
         )
+    window = TimeWindow.between(date_from, date_to)
+    if window.days > _max_amount_of_days:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Период не может быть длиннее {_max_amount_of_days} дней",
+        )
+    return window
 
-        if user_id is not None:
-            query = query.where(Document.author_id == user_id)
-
-        result = await session.execute(query)
-        data = result.all()
 
-        stats = {(start_date + timedelta(days=i)).isoformat(): 0 for i in range(days)}
+def series_items(dates: List[date], values, key: str) -> List[Dict[str, Any]]:
+    return [
+        {"date": day.isoformat(), key: int(value)} for day, value in zip(dates, values)
+    ]
 
-        for row in data:
-            date_str = row.date.isoformat()
-            stats[date_str] = row.count
 
-        return [{"date": k, "count": v} for k, v in stats.items()]
+async def get_documents_stats(
+    window: TimeWindow,
+    granularity: Granularity,
+    user_id: Optional[int],
+    session: AsyncSession,
+    use_engine: bool = True,
+) -> List[Dict[str, Any]]:
+    if use_engine and analytics_engine.ready:
+        return series_items(
+            *analytics_engine.documents_series(window, granularity, user_id), "count"
+        )
+    try:
+        criteria = []
+        if user_id is not None:
+            criteria.append(DailyDocumentStat.author_id == user_id)
+
+        query = series_query(
+            window,
+            granularity,
+            DailyDocumentStat.day,
+            func.sum(DailyDocumentStat.documents_count),
+            *criteria,
+        )
+        result = await session.execute(query)
+        return [
+            {"date": row.date.isoformat(), "count": int(row.value)} for row in result
+        ]
     except Exception as e:
         logger.error(f"Произошла ошибка при получении статистике о Документах: {e}")
         raise HTTPException(
@@ -73,41 +105,28 @@ async def get_documents_stats(
         )
 
 
-async def get_patients_stats(days: int, session: AsyncSession) -> List[Dict[str, Any]]:
+async def get_patients_stats(
+    window: TimeWindow,
+    granularity: Granularity,
+    session: AsyncSession,
+    use_engine: bool = True,
+) -> List[Dict[str, Any]]:
+    if use_engine and analytics_engine.ready:
+        return series_items(
+            *analytics_engine.patients_series(window, granularity), "patient_count"
+        )
     try:
-        if days < 1 or days > _max_amount_of_days:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Аргумент 'Дни' должен лежать в пределах 1 и {_max_amount_of_days}",
-            )
-
-        today = datetime.now().date()
-        start_date = today - timedelta(days=days - 1)
-
-        query = (
-            select(
-                func.date(Document.created_at).label("date"),
-                func.count(func.distinct(Document.patient_id)).label("patient_count"),
-            )
-            .where(func.date(Document.created_at) >= start_date)
-            .group_by(func.date(Document.created_at))
-            .order_by(func.date(Document.created_at))
+        # За неделю или месяц пациент с документами в разные дни считается один раз
+        query = series_query(
+            window,
+            granularity,
+            DailyPatientActivity.day,
+            func.count(distinct(DailyPatientActivity.patient_id)),
         )
-
         result = await session.execute(query)
-        data = result.all()
-
-        stats = {
-            (start_date + timedelta(days=i)).isoformat(): {"patient_count": 0}
-            for i in range(days)
-        }
-
-        for row in data:
-            date_str = row.date.isoformat()
-            stats[date_str]["patient_count"] = row.patient_count
-
         return [
-            {"date": k, "patient_count": v["patient_count"]} for k, v in stats.items()
+            {"date": row.date.isoformat(), "patient_count": int(row.value)}
+            for row in result
         ]
     except Exception as e:
         logger.error(f"Произошла ошибка при получении статистике о Пациентах: {e}")
@@ -117,40 +136,28 @@ async def get_patients_stats(days: int, session: AsyncSession) -> List[Dict[str,
         )
 
 
-async def get_users_stats(days: int, session: AsyncSession) -> List[Dict[str, Any]]:
+async def get_users_stats(
+    window: TimeWindow,
+    granularity: Granularity,
+    session: AsyncSession,
+    use_engine: bool = True,
+) -> List[Dict[str, Any]]:
+    if use_engine and analytics_engine.ready:
+        return series_items(
+            *analytics_engine.users_series(window, granularity), "users_count"
+        )
     try:
-        if days < 1 or days > _max_amount_of_days:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Аргумент 'Дни' должен лежать в пределах 1 и {_max_amount_of_days}",
-            )
-
-        today = datetime.now().date()
-        start_date = today - timedelta(days=days - 1)
-
-        query = (
-            select(
-                func.date(User.created_at).label("date"),
-                func.count().label("users_count"),
-            )
-            .where(func.date(User.created_at) >= start_date)
-            .group_by(func.date(User.created_at))
-            .order_by(func.date(User.created_at))
+        query = series_query(
+            window,
+            granularity,
+            DailyUserStat.day,
+            func.sum(DailyUserStat.users_count),
         )
-
         result = await session.execute(query)
-        data = result.all()
-
-        stats = {
-            (start_date + timedelta(days=i)).isoformat(): {"users_count": 0}
-            for i in range(days)
-        }
-
-        for row in data:
-            date_str = row.date.isoformat()
-            stats[date_str]["users_count"] = row.users_count
-
-        return [{"date": k, "users_count": v["users_count"]} for k, v in stats.items()]
+        return [
+            {"date": row.date.isoformat(), "users_count": int(row.value)}
+            for row in result
+        ]
     except Exception as e:
         logger.error(f"Произошла ошибка при получении статистике о Пользователях: {e}")
         raise HTTPException(
@@ -159,17 +166,22 @@ async def get_users_stats(days: int, session: AsyncSession) -> List[Dict[str, An
         )
 
 
-async def get_roles_count(days: int, session: AsyncSession) -> List[Dict[str, Any]]:
+async def get_roles_count(
+    window: TimeWindow, session: AsyncSession, use_engine: bool = True
+) -> List[Dict[str, Any]]:
+    if use_engine and analytics_engine.ready:
+        return [
+            {"role": role, "count": count}
+            for role, count in analytics_engine.roles_count(window)
+        ]
     try:
-        today = datetime.now().date()
-        start_date = today - timedelta(days=days - 1)
-
         query = (
             select(
-                Role.name.label("role_name"), func.count(User.id).label("user_count")
+                Role.name.label("role_name"),
+                func.sum(DailyUserStat.users_count).label("user_count"),
             )
-            .join(User, Role.id == User.role_id)
-            .where(func.date(User.created_at) >= start_date)
+            .join(DailyUserStat, Role.id == DailyUserStat.role_id)
+            .where(window.filter_days(DailyUserStat.day))
             .group_by(Role.name)
         )
 
@@ -186,18 +198,21 @@ async def get_roles_count(days: int, session: AsyncSession) -> List[Dict[str, An
 
 
 async def get_documents_by_subdir(
-    days: int, session: AsyncSession
+    window: TimeWindow, session: AsyncSession, use_engine: bool = True
 ) -> List[Dict[str, Any]]:
+    if use_engine and analytics_engine.ready:
+        return [
+            {"subdirectory": subdir.value, "count": count}
+            for subdir, count in analytics_engine.documents_by_subdirectory(window)
+        ]
     try:
-        today = datetime.now().date()
-        start_date = today - timedelta(days=days - 1)
-
         query = (
             select(
-                Document.subdirectory_type, func.count(Document.id).label("doc_count")
+                DailyDocumentStat.subdirectory_type,
+                func.sum(DailyDocumentStat.documents_count).label("doc_count"),
             )
-            .where(func.date(Document.created_at) >= start_date)
-            .group_by(Document.subdirectory_type)
+            .where(window.filter_days(DailyDocumentStat.day))
+            .group_by(DailyDocumentStat.subdirectory_type)
         )
 
         result = await session.execute(query)
@@ -218,6 +233,82 @@ async def get_documents_by_subdir(
         )
 
 
+DASHBOARD_KEY_PREFIX = "statistics:dashboard"
+
+
+async def get_cached_dashboard(
+    days: int, granularity: Granularity
+) -> Optional[DashboardResponse]:
+    try:
+        raw = await redis_client.get(f"{DASHBOARD_KEY_PREFIX}:{days}:{granularity}")
+    except RedisError as e:
+        logger.warning(f"Кэш статистики недоступен: {e}")
+        return None
+    return DashboardResponse.model_validate_json(raw) if raw else None
+
+
+async def cache_dashboard(dashboard: DashboardResponse) -> None:
+    try:
+        await redis_client.set(
+            f"{DASHBOARD_KEY_PREFIX}:{dashboard.days}:{dashboard.granularity}",
+            dashboard.model_dump_json(),
+            ex=settings.dashboard_cache_ttl,
+        )
+    except RedisError as e:
+        logger.warning(f"Не удалось сохранить статистику в кэш: {e}")
+
+
+@router.get(
+    "/dashboard",
+    response_model=DashboardResponse,
+    description=(
+        "Вся статистика панели за период одним запросом: динамика документов, "
+        "пациентов и пользователей, пользователи по ролям и документы по разделам"
+    ),
+    dependencies=[Depends(require_role(allowed_roles={1, 2}))],
+)
+async def get_dashboard(
+    request: Request,
+    days: int = Query(30, ge=1, le=_max_amount_of_days),
+    granularity: Granularity = Query("day"),
+) -> DashboardResponse:
+    cached = await get_cached_dashboard(days, granularity)
+    if cached is not None:
+        return cached
+
+    principal = getattr(request.state, "principal", None)
+    session_maker = await get_read_session_maker(
+        principal.id if principal is not None else None
+    )
+
+    # Каждая агрегация в своей сессии и соединении, поэтому запросы идут
+    # параллельно и время ответа определяется самым медленным из них
+    window = TimeWindow.last_days(days)
+
+    async def run(aggregation, *args):
+        async with session_maker() as session:
+            return await aggregation(window, *args, session)
+
+    documents, patients, users, roles, subdirectories = await asyncio.gather(
+        run(get_documents_stats, granularity, None),
+        run(get_patients_stats, granularity),
+        run(get_users_stats, granularity),
+        run(get_roles_count),
+        run(get_documents_by_subdir),
+    )
+    dashboard = DashboardResponse(
+        days=days,
+        granularity=granularity,
+        documents=documents,
+        patients=patients,
+        users=users,
+        roles=roles,
+        subdirectories=subdirectories,
+    )
+    await cache_dashboard(dashboard)
+    return dashboard
+
+
 @router.get(
     "/documents/{days}",
     response_model=List[Dict[str, Any]],
@@ -227,9 +318,12 @@ async def get_documents_by_subdir(
 @cache(expire=settings.cache_ttl, coder=Base64Coder, key_builder=custom_key_builder)
 async def get_stats_by_days(
     days: int = Path(..., ge=1, le=_max_amount_of_days, examples=30),
+    granularity: Granularity = Query("day"),
     session: AsyncSession = Depends(get_async_session),
 ):
-    return await get_documents_stats(days, None, session)
+    return await get_documents_stats(
+        TimeWindow.last_days(days), granularity, None, session
+    )
 
 
 @router.get(
@@ -242,9 +336,12 @@ async def get_stats_by_days(
 async def get_user_stats_by_days(
     days: int = Path(..., ge=1, le=_max_amount_of_days, examples=30),
     user_id: int = Path(...),
+    granularity: Granularity = Query("day"),
     session: AsyncSession = Depends(get_async_session),
 ):
-    return await get_documents_stats(days, user_id, session)
+    return await get_documents_stats(
+        TimeWindow.last_days(days), granularity, user_id, session
+    )
 
 
 @router.get(
@@ -256,9 +353,10 @@ async def get_user_stats_by_days(
 @cache(expire=settings.cache_ttl, coder=Base64Coder, key_builder=custom_key_builder)
 async def get_patients_dynamics(
     days: int = Path(..., ge=1, le=_max_amount_of_days, examples=30),
+    granularity: Granularity = Query("day"),
     session: AsyncSession = Depends(get_async_session),
 ):
-    return await get_patients_stats(days, session)
+    return await get_patients_stats(TimeWindow.last_days(days), granularity, session)
 
 
 @router.get(
@@ -270,9 +368,10 @@ async def get_patients_dynamics(
 @cache(expire=settings.cache_ttl, coder=Base64Coder, key_builder=custom_key_builder)
 async def get_users_dynamics(
     days: int = Path(..., ge=1, le=_max_amount_of_days, examples=30),
+    granularity: Granularity = Query("day"),
     session: AsyncSession = Depends(get_async_session),
 ):
-    return await get_users_stats(days, session)
+    return await get_users_stats(TimeWindow.last_days(days), granularity, session)
 
 
 @router.get(
@@ -286,7 +385,7 @@ async def get_roles_stats(
     days: int = Path(..., ge=1, le=_max_amount_of_days),
     session: AsyncSession = Depends(get_async_session),
 ):
-    return await get_roles_count(days, session)
+    return await get_roles_count(TimeWindow.last_days(days), session)
 
 
 @router.get(
@@ -300,140 +399,385 @@ async def get_subdirectories_stats(
     days: int = Path(..., ge=1, le=_max_amount_of_days),
     session: AsyncSession = Depends(get_async_session),
 ):
-    return await get_documents_by_subdir(days, session)
+    return await get_documents_by_subdir(TimeWindow.last_days(days), session)
+
+
+@router.get(
+    "/series/{metric}",
+    response_model=List[Dict[str, Any]],
+    description=(
+        "Динамика документов, пациентов или пользователей за произвольный период "
+        "с группировкой по дням, неделям или месяцам. Дата элемента - начало интервала"
+    ),
+    dependencies=[Depends(require_role(allowed_roles={1, 2}))],
+)
+async def get_series(
+    metric: Literal["documents", "patients", "users"],
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+    granularity: Granularity = Query("day"),
+    user_id: Optional[int] = Query(None, description="Автор документов"),
+    session: AsyncSession = Depends(get_async_session),
+):
+    window = get_range_window(date_from, date_to)
+    if metric == "documents":
+        return await get_documents_stats(window, granularity, user_id, session)
+    if metric == "patients":
+        return await get_patients_stats(window, granularity, session)
+    return await get_users_stats(window, granularity, session)
+
+
+async def get_unique_patients(
+    window: TimeWindow, session: AsyncSession, use_engine: bool = True
+) -> int:
+    if use_engine and analytics_engine.ready:
+        return analytics_engine.unique_patients(window)
+    return await session.scalar(
+        select(func.count(distinct(DailyPatientActivity.patient_id))).where(
+            window.filter_days(DailyPatientActivity.day)
+        )
+    )
+
+
+@router.get(
+    "/patients/unique",
+    description=(
+        "Число уникальных пациентов с документами за произвольный период. По "
+        "умолчанию - оценка по HyperLogLog-скетчам (погрешность около 1%), "
+        "exact=true - точный подсчёт"
+    ),
+    dependencies=[Depends(require_role(allowed_roles={1, 2}))],
+)
+async def get_unique_patients_count(
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+    exact: bool = Query(False),
+    session: AsyncSession = Depends(get_async_session),
+):
+    window = get_range_window(date_from, date_to)
+    count = None if exact else await count_unique_patients(window)
+    if count is None and not exact and await claim_rebuild():
+        logger.info("Скетчи пациентов не собраны, запущена пересборка")
+        await asyncio.to_thread(rebuild_patient_sketches.delay)
+    if count is None:
+        try:
+            count = await get_unique_patients(window, session)
+        except Exception as e:
+            logger.error(f"Ошибка при подсчёте уникальных пациентов: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Ошибка при подсчёте уникальных пациентов",
+            )
+        exact = True
+    return {
+        "date_from": date_from.isoformat(),
+        "date_to": date_to.isoformat(),
+        "patient_count": count,
+        "exact": exact,
+    }
+
+
+async def get_documents_by_author(
+    window: TimeWindow, session: AsyncSession
+) -> Dict[Optional[int], int]:
+    result = await session.execute(
+        select(DailyDocumentStat.author_id, func.sum(DailyDocumentStat.documents_count))
+        .where(window.filter_days(DailyDocumentStat.day))
+        .group_by(DailyDocumentStat.author_id)
+    )
+    return {author_id: int(count) for author_id, count in result}
+
+
+def compare_items(sql: List[Dict[str, Any]], engine: List[Dict[str, Any]]) -> List[dict]:
+    """Расхождения по первому ключу элемента (дата, роль, раздел)"""
+    sql_values = {tuple(item.values())[0]: tuple(item.values())[1] for item in sql}
+    engine_values = {tuple(item.values())[0]: tuple(item.values())[1] for item in engine}
+    return compare_values(sql_values, engine_values)
+
+
+def compare_values(sql: Dict[Any, int], engine: Dict[Any, int]) -> List[dict]:
+    return [
+        {"key": key, "sql": sql.get(key, 0), "engine": engine.get(key, 0)}
+        for key in sorted(set(sql) | set(engine), key=str)
+        if sql.get(key, 0) != engine.get(key, 0)
+    ]
+
+
+@router.get(
+    "/engine/consistency",
+    description=(
+        "Сверка аналитики в памяти процесса (ANALYTICS_ENGINE) с дневными "
+        "агрегатами в БД за период: все ряды, роли, разделы и документы по авторам"
+    ),
+    dependencies=[Depends(require_role(allowed_roles={1}))],
+)
+async def check_engine_consistency(
+    days: int = Query(365, ge=1, le=_max_amount_of_days),
+    granularity: Granularity = Query("day"),
+):
+    response = {
+        "enabled": settings.ANALYTICS_ENGINE,
+        "engine": analytics_engine.stats(),
+        "consistent": None,
+        "mismatches": {},
+    }
+    if not analytics_engine.ready:
+        return response
+
+    window = TimeWindow.last_days(days)
+    checks = {
+        "documents": lambda use: get_documents_stats(
+            window, granularity, None, session, use
+        ),
+        "patients": lambda use: get_patients_stats(window, granularity, session, use),
+        "users": lambda use: get_users_stats(window, granularity, session, use),
+        "roles": lambda use: get_roles_count(window, session, use),
+        "subdirectories": lambda use: get_documents_by_subdir(window, session, use),
+    }
+    mismatches = {}
+    # Основная БД, а не реплика: отставание реплики выглядело бы расхождением
+    async with async_session_maker() as session:
+        for name, check in checks.items():
+            mismatches[name] = compare_items(await check(False), await check(True))
+        mismatches["authors"] = compare_values(
+            await get_documents_by_author(window, session),
+            analytics_engine.documents_by_author(window),
+        )
+        mismatches["unique_patients"] = compare_values(
+            {"total": await get_unique_patients(window, session, False)},
+            {"total": analytics_engine.unique_patients(window)},
+        )
+
+    response["mismatches"] = {name: items for name, items in mismatches.items() if items}
+    response["consistent"] = not response["mismatches"]
+    if response["mismatches"]:
+        logger.warning(f"Аналитика в памяти расходится с БД: {response['mismatches']}")
+    return response
+
+
+# Формат: (генератор частей файла, media type, расширение)
+STREAMING_EXPORTS = {
+    "csv": (csv_chunks, "text/csv; charset=utf-8", "csv"),
+    "parquet": (parquet_chunks, MEDIA_TYPES["parquet"], "parquet"),
+    "arrow": (arrow_chunks, "application/vnd.apache.arrow.stream", "arrows"),
+}
+
+
+async def stream_export(
+    request: Request,
+    export_format: str,
+    report_type: str,
+    days: Optional[int],
+    user_id: Optional[int],
+    batch_size: int,
+) -> StreamingResponse:
+    window = TimeWindow.last_days(days) if days else None
+    try:
+        report, query = build_report(report_type, window, user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    principal = getattr(request.state, "principal", None)
+    session_maker = await get_read_session_maker(
+        principal.id if principal is not None else None
+    )
+    chunks, media_type, extension = STREAMING_EXPORTS[export_format]
+    return StreamingResponse(
+        chunks(query, report.headers, batch_size, session_maker),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": (
+                f"attachment; filename={report_type}_report.{extension}"
+            )
+        },
+    )
 
 
 @router.get(
     "/export/csv",
+    description=(
+        "Выгрузка отчёта в CSV по мере чтения из БД. Кроме агрегированных "
+        "отчётов доступны построчные document-records, patient-records и "
+        "user-activity, для них период необязателен"
+    ),
     dependencies=[Depends(require_role(allowed_roles={1, 2}))],
 )
 async def export_csv_report(
+    request: Request,
     report_type: str,
-    days: int = Query(..., ge=1, le=365 * 5),
+    days: Optional[int] = Query(None, ge=1, le=_max_amount_of_days),
     user_id: Optional[int] = None,
-    session: AsyncSession = Depends(get_async_session),
+    batch_size: int = Query(
+        settings.stream_batch_size, ge=1, le=settings.stream_max_batch_size
+    ),
 ):
-    try:
-        if report_type == "roles":
-            data = await get_roles_count(days, session)
-        elif report_type == "documents":
-            data = await get_documents_by_subdir(days, session)
-        elif report_type == "patients":
-            data = await get_patients_stats(days, session)
-        elif report_type == "users":
-            data = await get_users_stats(days, session)
-        elif report_type == "user-documents":
-            if not user_id:
-                raise HTTPException(status_code=400, detail="Необходим ID Пользователя")
-            data = await get_documents_stats(days, user_id, session)
-        else:
-            raise HTTPException(status_code=400, detail="Неверный формат отчета")
-
-        required_fields = {
-            "roles": ["role", "count"],
-            "documents": ["subdirectory", "count"],
-            "patients": ["date", "patient_count"],
-            "users": ["date", "users_count"],
-            "user-documents": ["date", "count"],
-        }.get(report_type, [])
-
-        for item in data:
-            if not all(field in item for field in required_fields):
-                logger.error(f"Некорректные данные: {item}")
-                raise HTTPException(status_code=500, detail="Ошибка формата данных")
-
-        csv_buffer = io.StringIO()
-        writer = csv.writer(csv_buffer, delimiter=";", lineterminator="\n")
-
-        headers_map = {
-            "roles": ["Роль", "Количество"],
-            "documents": ["Категория", "Количество"],
-            "patients": ["Дата", "Количество пациентов"],
-            "users": ["Дата", "Количество пользователей"],
-            "user-documents": ["Дата", "Количество документов"],
-        }
-
-        rows_map = {
-            "roles": lambda item: [item["role"], item["count"]],
-            "documents": lambda item: [item["subdirectory"], item["count"]],
-            "patients": lambda item: [item["date"], item["patient_count"]],
-            "users": lambda item: [item["date"], item["users_count"]],
-            "user-documents": lambda item: [item["date"], item["count"]],
-        }
-
-        headers = headers_map[report_type]
-        rows = [rows_map[report_type](item) for item in data]
-
-        writer.writerow(headers)
-        writer.writerows(rows)
-
-        csv_buffer.seek(0)
-        return StreamingResponse(
-            io.BytesIO(csv_buffer.getvalue().encode("utf-8-sig")),
-            media_type="text/csv",
-            headers={
-                "Content-Disposition": f"attachment; filename={report_type}_report.csv"
-            },
-        )
+    return await stream_export(request, "csv", report_type, days, user_id, batch_size)
 
-    except HTTPException as he:
-        raise he
-    except Exception as e:
-        logger.error(f"Ошибка при экспорте в формат CSV: {str(e)}")
-        raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+
+@router.get(
+    "/export/parquet",
+    description=(
+        "Выгрузка отчёта в Parquet (zstd) по мере чтения из БД, типы колонок "
+        "соответствуют типам в БД. Отчёты те же, что и для CSV"
+    ),
+    dependencies=[Depends(require_role(allowed_roles={1, 2}))],
+)
+async def export_parquet_report(
+    request: Request,
+    report_type: str,
+    days: Optional[int] = Query(None, ge=1, le=_max_amount_of_days),
+    user_id: Optional[int] = None,
+    batch_size: int = Query(
+        settings.stream_max_batch_size, ge=1, le=settings.stream_max_batch_size
+    ),
+):
+    return await stream_export(
+        request, "parquet", report_type, days, user_id, batch_size
+    )
+
+
+@router.get(
+    "/export/arrow",
+    description=(
+        "Выгрузка отчёта в формате Arrow IPC stream (zstd): "
+        "pyarrow.ipc.open_stream или pandas через pyarrow. Отчёты те же, что и для CSV"
+    ),
+    dependencies=[Depends(require_role(allowed_roles={1, 2}))],
+)
+async def export_arrow_report(
+    request: Request,
+    report_type: str,
+    days: Optional[int] = Query(None, ge=1, le=_max_amount_of_days),
+    user_id: Optional[int] = None,
+    batch_size: int = Query(
+        settings.stream_max_batch_size, ge=1, le=settings.stream_max_batch_size
+    ),
+):
+    return await stream_export(request, "arrow", report_type, days, user_id, batch_size)
 
 
 @router.get(
     "/export/xlsx",
+    description=(
+        "Выгрузка отчёта в XLSX. Файл строится в отдельном процессе, при "
+        "занятых процессах выгрузки возвращается 503"
+    ),
     dependencies=[Depends(require_role(allowed_roles={1}))],
 )
 async def export_xlsx_report(
     report_type: str,
-    days: int = Query(..., ge=1, le=365 * 5),
+    days: Optional[int] = Query(None, ge=1, le=_max_amount_of_days),
     user_id: Optional[int] = None,
-    session: AsyncSession = Depends(get_async_session),
 ):
+    window = TimeWindow.last_days(days) if days else None
     try:
-        if report_type == "roles":
-            data = await get_roles_count(days, session)
-        elif report_type == "documents":
-            data = await get_documents_by_subdir(days, session)
-        elif report_type == "patients":
-            data = await get_patients_stats(days, session)
-        elif report_type == "users":
-            data = await get_users_stats(days, session)
-        elif report_type == "user-documents":
-            if not user_id:
-                raise HTTPException(status_code=400, detail="Необходим ID Пользователя")
-            data = await get_documents_stats(days, user_id, session)
-        else:
-            raise HTTPException(status_code=400, detail="Неверный формат отчёта")
-
-        df = pd.DataFrame()
-        if report_type == "roles":
-            df = pd.DataFrame([{"Роль": item["role"], "Количество": item["count"]} for item in data])
-        elif report_type == "documents":
-            df = pd.DataFrame([{"Категория": item["subdirectory"], "Количество": item["count"]} for item in data])
-        elif report_type == "patients":
-            df = pd.DataFrame([{"Дата": item["date"], "Количество пациентов": item["patient_count"]} for item in data])
-        elif report_type == "users":
-            df = pd.DataFrame([{"Дата": item["date"], "Количество пользователей": item["users_count"]} for item in data])
-        elif report_type == "user-documents":
-            df = pd.DataFrame([{"Дата": item["date"], "Количество документов": item["count"]} for item in data])
-
-        excel_buffer = io.BytesIO()
-        with pd.ExcelWriter(excel_buffer, engine="openpyxl") as writer:
-            df.to_excel(writer, index=False, sheet_name="Отчёт")
-
-        excel_buffer.seek(0)
-        return StreamingResponse(
-            excel_buffer,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={
-                "Content-Disposition": f"attachment; filename={report_type}_report.xlsx"
-            },
-        )
+        build_report(report_type, window, user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
+    try:
+        path = await run_export(build_xlsx_file, report_type, days, user_id)
+    except ExportQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Слишком много выгрузок, повторите позже",
+            headers={"Retry-After": "30"},
+        )
     except Exception as e:
         logger.error(f"Ошибка при экспорте в формат Excel: {str(e)}")
         raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+
+    return FileResponse(
+        path,
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        filename=f"{report_type}_report.xlsx",
+        background=BackgroundTask(os.unlink, path),
+    )
+
+
+def get_job_window(job: ExportJobCreate) -> Optional[TimeWindow]:
+    if job.date_from or job.date_to:
+        if not (job.date_from and job.date_to):
+            raise HTTPException(
+                status_code=400, detail="Необходимо указать начало и конец периода"
+            )
+        return get_range_window(job.date_from, job.date_to)
+    if job.days:
+        return TimeWindow.last_days(job.days)
+    return None
+
+
+@router.post(
+    "/export/jobs",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=ExportJobResponse,
+    description=(
+        "Фоновая выгрузка отчёта в CSV, XLSX, Parquet или Arrow. Прогресс - "
+        "/utils/tasks/{task_id}, готовый файл - download_url"
+    ),
+)
+async def create_export_job(
+    job: ExportJobCreate,
+    principal: Principal = Depends(require_role(allowed_roles={1, 2})),
+) -> ExportJobResponse:
+    window = get_job_window(job)
+    try:
+        build_report(job.report_type, window, job.user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        task = await asyncio.to_thread(
+            export_report.delay,
+            job.report_type,
+            job.format,
+            window.start_date.isoformat() if window else None,
+            (window.end_date - timedelta(days=1)).isoformat() if window else None,
+            job.user_id,
+            principal.id,
+        )
+    except Exception as e:
+        logger.error(f"Не удалось поставить выгрузку в очередь: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Очередь выгрузок недоступна",
+        )
+
+    prefix = settings.api_v1_prefix
+    return ExportJobResponse(
+        task_id=task.id,
+        status_url=f"{prefix}/utils/tasks/{task.id}",
+        download_url=f"{prefix}/statistics/export/jobs/{task.id}/download",
+    )
+
+
+def read_export_result(task_id: str) -> Tuple[str, Any]:
+    task_result = AsyncResult(task_id, app=celery)
+    return task_result.status, task_result.result
+
+
+@router.get(
+    "/export/jobs/{task_id}/download",
+    description="Скачивание файла фоновой выгрузки, доступно только её автору",
+)
+async def download_export(
+    task_id: str,
+    principal: Principal = Depends(require_role(allowed_roles={1, 2})),
+):
+    task_status, result = await asyncio.to_thread(read_export_result, task_id)
+    if task_status != "SUCCESS" or not isinstance(result, dict):
+        if task_status in ("PENDING", "STARTED", "PROGRESS", "RETRY"):
+            raise HTTPException(status_code=409, detail="Выгрузка ещё не завершена")
+        raise HTTPException(status_code=404, detail="Выгрузка не найдена")
+    if result.get("owner_id") != principal.id:
+        raise HTTPException(status_code=404, detail="Выгрузка не найдена")
+
+    path = export_path(task_id, result["format"])
+    if not path.exists():
+        raise HTTPException(status_code=410, detail="Срок хранения выгрузки истёк")
+
+    return FileResponse(
+        path,
+        media_type=MEDIA_TYPES[result["format"]],
+        filename=f"{result['report_type']}_report.{result['format']}",
+    )
@@ -1,17 +1,20 @@
 from fastapi import (
     APIRouter,
+    Body,
     Depends,
     status,
     HTTPException,
     File,
     UploadFile,
     Form,
+    Query,
+    Request,
     Response,
 )
-from fastapi_cache.decorator import cache
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi_cache import FastAPICache
 from sqlalchemy.exc import IntegrityError
-from pydantic import BaseModel, ValidationError
+from pydantic import BaseModel, TypeAdapter, ValidationError
 from asyncpg.exceptions import UniqueViolationError
 from redis import asyncio as aioredis
 
@@ -20,12 +23,13 @@ import json
 import traceback
 import re
 
-from typing import List, Dict, Any, TypeVar, Generic, Type, Optional
+from typing import AsyncIterator, List, Dict, Any, Literal, TypeVar, Generic, Type, Optional
 from auth.auth import require_role
 
 from services.base import BaseService
+from schemas.bulk import BulkItemError, BulkResult, BulkDeleteResult
 from config import settings, logger
-from cache.utils import Base64Coder
+from db.db import get_read_session_maker
 from .utils import get_russian_forms
 
 T = TypeVar("T", bound=BaseModel)
@@ -74,6 +78,7 @@ def create_base_router(
 ):
     forms = get_russian_forms(object_name, gender)
     router = APIRouter(prefix=prefix, tags=tags)
+    list_adapter = TypeAdapter(List[read_schema])
     cache_prefix = prefix.strip("/")
     
     def validate_file_extension(filename: str):
@@ -101,8 +106,9 @@ def create_base_router(
         service: BaseService = Depends(service_dependency),
     ) -> List[read_schema]:
         try:
-            objects = await service.get_all_objects()
-            return objects if objects else []
+            rows = await service.get_all_rows(read_schema.model_fields)
+            items = list_adapter.validate_python(rows)
+            return ORJSONResponse(list_adapter.dump_python(items))
         except Exception as e:
             logger.error(
                 f"Ошибка при получении {forms['genitive_plural']}: {traceback.format_exc()}"
@@ -217,6 +223,258 @@ def create_base_router(
                     detail=f"Ошибка при создании {forms['родительный']}",
                 )
 
+    if not has_file_field:
+
+        @router.post(
+            "/bulk",
+            response_model=BulkResult[read_schema],
+            status_code=status.HTTP_201_CREATED,
+            responses={
+                201: {"description": f"{forms['plural']} успешно созданы"},
+                409: {"description": "Нарушение ограничений базы данных"},
+                500: {"description": "Внутренняя ошибка сервера"},
+            },
+            description=f"Массовое создание {forms['genitive_plural']} одним запросом.",
+            dependencies=[Depends(require_role(allowed_roles=create_roles))],
+        )
+        async def bulk_create(
+            items: List[Dict[str, Any]] = Body(..., max_length=settings.bulk_max_items),
+            service=Depends(service_dependency),
+        ):
+            valid_items = []
+            positions = []
+            errors = []
+            for index, item in enumerate(items):
+                try:
+                    data = create_schema(**item).model_dump()
+                    valid_items.append(service.apply_model_rules(data))
+                    positions.append(index)
+                except ValidationError as e:
+                    errors.append(
+                        BulkItemError(
+                            index=index,
+                            detail=e.errors(include_url=False, include_context=False),
+                        )
+                    )
+                except ValueError as e:
+                    errors.append(BulkItemError(index=index, detail=str(e)))
+
+            try:
+                conflicts = await service.find_conflicts(valid_items)
+                for position, detail in conflicts.items():
+                    errors.append(
+                        BulkItemError(index=positions[position], detail=detail)
+                    )
+                created = await service.bulk_create_objects(
+                    [
+                        item
+                        for position, item in enumerate(valid_items)
+                        if position not in conflicts
+                    ]
+                )
+                errors.sort(key=lambda error: error.index)
+                return {"items": created, "errors": errors}
+            except IntegrityError:
+                detail = f"{forms['plural']} с такими данными уже существуют"
+                logger.warning(detail)
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail)
+            except Exception:
+                logger.error(
+                    f"Ошибка при массовом создании {forms['genitive_plural']}: {traceback.format_exc()}"
+                )
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"Ошибка при создании {forms['genitive_plural']}",
+                )
+
+        @router.patch(
+            "/bulk",
+            response_model=BulkResult[read_schema],
+            responses={
+                200: {"description": f"{forms['plural']} успешно обновлены"},
+                409: {"description": "Нарушение ограничений базы данных"},
+                500: {"description": "Внутренняя ошибка сервера"},
+            },
+            description=(
+                f"Массовое обновление {forms['genitive_plural']} одним запросом. "
+                "Каждый элемент должен содержать поле id."
+            ),
+            dependencies=[Depends(require_role(allowed_roles=update_roles))],
+        )
+        async def bulk_update(
+            items: List[Dict[str, Any]] = Body(..., max_length=settings.bulk_max_items),
+            service=Depends(service_dependency),
+        ):
+            valid_items = []
+            positions = {}
+            errors = []
+            for index, item in enumerate(items):
+                obj_id = item.get("id")
+                if not isinstance(obj_id, int) or obj_id in positions:
+                    errors.append(
+                        BulkItemError(
+                            index=index,
+                            id=obj_id if isinstance(obj_id, int) else None,
+                            detail="Не указан или повторяется идентификатор",
+                        )
+                    )
+                    continue
+                try:
+                    data = update_schema(
+                        **{key: value for key, value in item.items() if key != "id"}
+                    ).model_dump(exclude_unset=True)
+                    data = service.apply_model_rules({"id": obj_id, **data})
+                except ValidationError as e:
+                    errors.append(
+                        BulkItemError(
+                            index=index,
+                            id=obj_id,
+                            detail=e.errors(include_url=False, include_context=False),
+                        )
+                    )
+                    continue
+                except ValueError as e:
+                    errors.append(BulkItemError(index=index, id=obj_id, detail=str(e)))
+                    continue
+                positions[obj_id] = index
+                valid_items.append(data)
+
+            try:
+                conflicts = await service.find_conflicts(valid_items)
+                for position, detail in conflicts.items():
+                    obj_id = valid_items[position]["id"]
+                    errors.append(
+                        BulkItemError(
+                            index=positions[obj_id], id=obj_id, detail=detail
+                        )
+                    )
+                valid_items = [
+                    item
+                    for position, item in enumerate(valid_items)
+                    if position not in conflicts
+                ]
+                updated = await service.bulk_update_objects(valid_items)
+            except IntegrityError:
+                detail = f"{forms['plural']} с такими данными уже существуют"
+                logger.warning(detail)
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail)
+            except Exception:
+                logger.error(
+                    f"Ошибка при массовом обновлении {forms['genitive_plural']}: {traceback.format_exc()}"
+                )
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"Ошибка при обновлении {forms['genitive_plural']}",
+                )
+
+            updated_ids = {obj.id for obj in updated}
+            for item in valid_items:
+                if item["id"] not in updated_ids:
+                    errors.append(
+                        BulkItemError(
+                            index=positions[item["id"]],
+                            id=item["id"],
+                            detail=f"{forms['именительный'].capitalize()} не {forms['найден']}",
+                        )
+                    )
+            errors.sort(key=lambda error: error.index)
+            return {"items": updated, "errors": errors}
+
+    @router.delete(
+        "/bulk",
+        response_model=BulkDeleteResult,
+        responses={
+            200: {"description": f"{forms['plural']} успешно удалены"},
+            500: {"description": "Внутренняя ошибка сервера"},
+        },
+        description=f"Массовое удаление {forms['genitive_plural']} по списку идентификаторов.",
+        dependencies=[Depends(require_role(allowed_roles=delete_roles))],
+    )
+    async def bulk_delete(
+        ids: List[int] = Body(..., max_length=settings.bulk_max_items),
+        service=Depends(service_dependency),
+    ):
+        try:
+            deleted = await service.bulk_delete_objects(list(set(ids)))
+        except Exception:
+            logger.error(
+                f"Ошибка при массовом удалении {forms['genitive_plural']}: {traceback.format_exc()}"
+            )
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Ошибка при удалении {forms['genitive_plural']}",
+            )
+
+        deleted_ids = set(deleted)
+        errors = [
+            BulkItemError(
+                index=index,
+                id=obj_id,
+                detail=f"{forms['именительный'].capitalize()} не {forms['найден']}",
+            )
+            for index, obj_id in enumerate(ids)
+            if obj_id not in deleted_ids
+        ]
+        return {"deleted": sorted(deleted_ids), "errors": errors}
+
+    @router.get(
+        "/stream",
+        responses={
+            200: {
+                "description": f"Поток {forms['genitive_plural']}",
+                "content": {"application/x-ndjson": {}, "application/json": {}},
+            },
+        },
+        response_class=StreamingResponse,
+        description=(
+            f"Выгрузка всех {forms['genitive_plural']} потоком по мере чтения из БД: "
+            "ndjson - по объекту на строку, json - массив, отдаваемый частями."
+        ),
+        dependencies=[Depends(require_role(allowed_roles=get_all_roles))],
+    )
+    async def stream_all(
+        request: Request,
+        format: Literal["ndjson", "json"] = Query("ndjson"),
+        batch_size: int = Query(
+            settings.stream_batch_size, ge=1, le=settings.stream_max_batch_size
+        ),
+        service: BaseService = Depends(service_dependency),
+    ) -> StreamingResponse:
+        principal = getattr(request.state, "principal", None)
+        session_maker = await get_read_session_maker(
+            principal.id if principal is not None else None
+        )
+        batches = service.stream_objects(
+            batch_size, read_schema.model_fields, session_maker=session_maker
+        )
+
+        async def body() -> AsyncIterator[bytes]:
+            separator = b"\n" if format == "ndjson" else b","
+            first = True
+            if format == "json":
+                yield b"["
+            try:
+                async for batch in batches:
+                    chunk = separator.join(
+                        read_schema.model_validate(obj).model_dump_json().encode()
+                        for obj in batch
+                    )
+                    if format == "ndjson":
+                        yield chunk + separator
+                    else:
+                        yield chunk if first else separator + chunk
+                    first = False
+            except Exception:
+                logger.error(
+                    f"Ошибка при выгрузке {forms['genitive_plural']}: {traceback.format_exc()}"
+                )
+                raise
+            if format == "json":
+                yield b"]"
+
+        media_type = "application/x-ndjson" if format == "ndjson" else "application/json"
+        return StreamingResponse(body(), media_type=media_type)
+
     @router.get(
         "/{obj_id}",
         responses={
@@ -232,7 +490,6 @@ def create_base_router(
         description=f"Получение {forms['родительный']} по идентификатору.",
         dependencies=[Depends(require_role(allowed_roles=get_by_id_roles))],
     )
-    @cache(expire=settings.cache_ttl, coder=Base64Coder, key_builder=custom_key_builder)
     async def get_by_id(
         obj_id: int, service: BaseService = Depends(service_dependency)
     ) -> read_schema:
@@ -304,7 +561,7 @@ def create_base_router(
                     file_content = await file.read()
                     data_dict[file_field_name] = file_content
                 try:
-                    update_data = update_schema(**data_dict).dict(exclude_unset=True)
+                    update_data = update_schema(**data_dict).model_dump(exclude_unset=True)
                 except ValidationError as e:
                     raise HTTPException(
                         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
@@ -346,7 +603,7 @@ def create_base_router(
             obj_id: int, data: update_schema, service=Depends(service_dependency)
         ) -> read_schema:
             try:
-                update_data = data.dict(exclude_unset=True)
+                update_data = data.model_dump(exclude_unset=True)
                 result = await service.update_object(obj_id, update_data)
                 if not result:
                     raise HTTPException(
@@ -416,9 +673,6 @@ def create_base_router(
             response_class=Response,
             dependencies=[Depends(require_role(allowed_roles=download_roles))],
         )
-        @cache(
-            expire=settings.cache_ttl, coder=Base64Coder, key_builder=custom_key_builder
-        )
         async def download_file(obj_id: int, service=Depends(service_dependency)):
             try:
                 result = await service.get_object_by_id(obj_id)
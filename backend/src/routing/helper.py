@@ -10,6 +10,7 @@ from fastapi import (
 )
 from fastapi.security import APIKeyHeader, HTTPBearer, HTTPAuthorizationCredentials
 from celery.result import AsyncResult
+import asyncio
 import os
 from datetime import datetime
 import subprocess
@@ -20,13 +21,23 @@ from tasks.tasks import celery
 
 router = APIRouter(prefix="/utils", tags=["utils"])
 
+def read_task_state(task_id: str) -> dict:
+    # Синхронные запросы к backend Celery, выполняются вне цикла событий
+    task_result = AsyncResult(task_id, app=celery)
+    return {
+        "status": task_result.status,
+        "result": task_result.result,
+        "ready": task_result.ready(),
+    }
+
+
 @router.get("/tasks/{task_id}")
 async def get_task_status(task_id: str):
     try:
-        task_result = AsyncResult(task_id, app=celery)
-        
-        result = task_result.result
-        if task_result.status == 'FAILURE':
+        state = await asyncio.to_thread(read_task_state, task_id)
+
+        result = state["result"]
+        if state["status"] == 'FAILURE':
             if isinstance(result, dict):  
                 error_info = {
                     'error_type': result.get('exc_type', 'UnknownError'),
@@ -41,11 +52,15 @@ async def get_task_status(task_id: str):
                 }
             result = error_info
 
+        # Прогресс задач, сообщающих его в meta (например, tasks.export_report)
+        progress = result.get("percent") if isinstance(result, dict) else None
+
         return {
             "task_id": task_id,
-            "status": task_result.status,
+            "status": state["status"],
             "result": result,
-            "ready": task_result.ready(),
+            "progress": progress,
+            "ready": state["ready"],
         }
     except Exception as e:
         logger.error(f"Произошла ошибка: {type(e).__name__} - {str(e)}")
@@ -1,19 +1,76 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from datetime import date
+from typing import List, Optional
+import traceback
+
 from .base import create_base_router
 from schemas.patients import *
+from services.patients import PatientService
 from depends import get_patient_service
+from config import settings, logger
+from auth.auth import require_role
+
+router = APIRouter()
+
+# Маршрут /patients/search объявляется до /patients/{obj_id} базового
+# роутера, иначе "search" разбирался бы как идентификатор
+search_router = APIRouter(prefix="/patients", tags=["patients"])
+
+
+@search_router.get(
+    "/search",
+    response_model=List[PatientSearchResult],
+    responses={
+        200: {"description": "Пациенты, подходящие под запрос"},
+        500: {"description": "Внутренняя ошибка сервера"},
+    },
+    description=(
+        "Поиск пациентов по части ФИО с учётом опечаток. Результаты упорядочены "
+        "по сходству с запросом, можно ограничить диапазон дат рождения."
+    ),
+    dependencies=[Depends(require_role(allowed_roles={1, 2, 3}))],
+)
+async def search_patients(
+    q: str = Query(..., min_length=3, max_length=255, description="Часть ФИО"),
+    born_from: Optional[date] = Query(None, description="Дата рождения не раньше"),
+    born_to: Optional[date] = Query(None, description="Дата рождения не позже"),
+    limit: int = Query(20, ge=1, le=settings.patient_search_max_limit),
+    offset: int = Query(0, ge=0),
+    service: PatientService = Depends(get_patient_service),
+) -> List[PatientSearchResult]:
+    try:
+        found = await service.search_patients(
+            q.strip(), born_from, born_to, limit, offset
+        )
+        return [
+            PatientSearchResult(
+                **PatientInDB.model_validate(patient).model_dump(), score=score
+            )
+            for patient, score in found
+        ]
+    except Exception:
+        logger.error(f"Ошибка при поиске пациентов: {traceback.format_exc()}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Ошибка при поиске пациентов",
+        )
+
 
-router = create_base_router(
-    prefix="/patients",
-    tags=["patients"],
-    service_dependency=get_patient_service,
-    create_schema=PatientCreate,
-    read_schema=PatientInDB,
-    update_schema=PatientUpdate,
-    object_name="пациент",
-    gender="m",
-    get_all_roles={1, 2, 3},
-    get_by_id_roles={1, 2, 3},
-    create_roles={1, 2, 3},
-    update_roles={1, 2, 3},
-    delete_roles={1, 2, 3},
+router.include_router(search_router)
+router.include_router(
+    create_base_router(
+        prefix="/patients",
+        tags=["patients"],
+        service_dependency=get_patient_service,
+        create_schema=PatientCreate,
+        read_schema=PatientInDB,
+        update_schema=PatientUpdate,
+        object_name="пациент",
+        gender="m",
+        get_all_roles={1, 2, 3},
+        get_by_id_roles={1, 2, 3},
+        create_roles={1, 2, 3},
+        update_roles={1, 2, 3},
+        delete_roles={1, 2, 3},
+    )
 )
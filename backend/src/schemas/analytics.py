@@ -1,7 +1,33 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import date
+from typing import Any, Dict, List, Literal, Optional
 
 
 class DailyReportCountResponse(BaseModel):
     date: date
     count: int
+
+
+class DashboardResponse(BaseModel):
+    days: int
+    granularity: str
+    documents: List[Dict[str, Any]]
+    patients: List[Dict[str, Any]]
+    users: List[Dict[str, Any]]
+    roles: List[Dict[str, Any]]
+    subdirectories: List[Dict[str, Any]]
+
+
+class ExportJobCreate(BaseModel):
+    report_type: str
+    format: Literal["csv", "xlsx", "parquet", "arrow"] = "csv"
+    days: Optional[int] = Field(None, ge=1, le=365 * 5)
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    user_id: Optional[int] = None
+
+
+class ExportJobResponse(BaseModel):
+    task_id: str
+    status_url: str
+    download_url: str
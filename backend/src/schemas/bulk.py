@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+
+from typing import Any, Generic, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class BulkItemError(BaseModel):
+    index: int
+    id: Optional[int] = None
+    detail: Any
+
+
+class BulkResult(BaseModel, Generic[T]):
+    items: List[T] = []
+    errors: List[BulkItemError] = []
+
+
+class BulkDeleteResult(BaseModel):
+    deleted: List[int] = []
+    errors: List[BulkItemError] = []
@@ -1,5 +1,5 @@
 from typing import Optional
-from pydantic import BaseModel, constr, validator
+from pydantic import BaseModel, ConfigDict, constr, field_validator
 from datetime import datetime
 from models.models import SubDirectories
 
@@ -10,7 +10,7 @@ class DocumentBase(BaseModel):
     subdirectory_type: SubDirectories
     author_id: Optional[int] = None
 
-    @validator("name")
+    @field_validator("name")
     def validate_name_length(cls, v):
         if len(v) > 255:
             raise ValueError("Название документа не может превышать 255 символов")
@@ -28,7 +28,7 @@ class DocumentUpdate(BaseModel):
     author_id: Optional[int] = None
     data: Optional[bytes] = None
 
-    @validator("name")
+    @field_validator("name")
     def validate_name_length(cls, v):
         if v and len(v) > 255:
             raise ValueError("Название документа не может превышать 255 символов")
@@ -40,6 +40,4 @@ class DocumentInDB(DocumentBase):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        populate_by_name = True
-        from_attributes = True
+    model_config = ConfigDict(populate_by_name=True, from_attributes=True)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, field_validator, Field
+from pydantic import BaseModel, ConfigDict, field_validator, Field
 from datetime import datetime, date
 import re
 from typing import Optional
@@ -45,6 +45,8 @@ class PatientInDB(PatientBase):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
-        populate_by_name = True
+    model_config = ConfigDict(from_attributes=True, populate_by_name=True)
+
+
+class PatientSearchResult(PatientInDB):
+    score: float = Field(..., description="Сходство ФИО с запросом, от 0 до 1")
@@ -1,5 +1,6 @@
 from pydantic import (
     BaseModel,
+    ConfigDict,
     EmailStr,
     constr,
     field_validator,
@@ -7,9 +8,8 @@ from pydantic import (
     Field,
     model_validator,
 )
-import bcrypt
 from datetime import datetime
-from typing import Optional, Union, Annotated
+from typing import Optional, Annotated
 from fastapi import UploadFile
 import re
 from config import logger
@@ -92,12 +92,6 @@ class UserCreate(UserBase):
             )
         return v
 
-    @field_validator("password")
-    def hash_password(cls, v: str) -> bytes:
-        salt = bcrypt.gensalt()
-        pwd_bytes: bytes = v.encode()
-        return bcrypt.hashpw(pwd_bytes, salt)
-
 
 class UserUpdate(UserBase):
     fio: Optional[Annotated[str, Field(pattern=FIO_REGEX)]] = None
@@ -112,14 +106,6 @@ class UserUpdate(UserBase):
         exclude=True,
     )
 
-    @field_validator("password")
-    def hash_password(cls, v: Union[str, None]) -> Optional[bytes]:
-        if v is None:
-            return None
-        salt = bcrypt.gensalt()
-        pwd_bytes: bytes = v.encode()
-        return bcrypt.hashpw(pwd_bytes, salt)
-
 
 class UserInDB(UserBase):
     id: int
@@ -127,7 +113,4 @@ class UserInDB(UserBase):
     updated_at: datetime
     active: bool
 
-    class Config:
-        from_attributes = True
-        populate_by_name = True
-        exclude = {"password"}
+    model_config = ConfigDict(from_attributes=True, populate_by_name=True)
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, TypeVar, Generic
+from typing import Any, AsyncIterator, Iterable, List, Dict, Optional, TypeVar, Generic
 
 T = TypeVar("T")
 
@@ -11,6 +11,14 @@ class BaseService(ABC, Generic[T]):
     async def get_all_objects(self) -> List[T]:
         return await self.repository.get_all()
 
+    async def get_all_rows(self, fields: Iterable[str]) -> List[Dict[str, Any]]:
+        return await self.repository.get_all_rows(fields)
+
+    def stream_objects(
+        self, batch_size: int, fields: Optional[Iterable[str]] = None, **kwargs
+    ) -> AsyncIterator[List[T]]:
+        return self.repository.stream_all(batch_size, fields, **kwargs)
+
     async def create_object(self, data: Dict) -> T:
         return await self.repository.create(data)
 
@@ -22,3 +30,18 @@ class BaseService(ABC, Generic[T]):
 
     async def delete_object(self, id: int) -> bool:
         return await self.repository.delete(id)
+
+    def apply_model_rules(self, item: Dict) -> Dict:
+        return self.repository.apply_model_rules(item)
+
+    async def find_conflicts(self, items: List[Dict]) -> Dict[int, str]:
+        return await self.repository.find_conflicts(items)
+
+    async def bulk_create_objects(self, items: List[Dict]) -> List[T]:
+        return await self.repository.bulk_create(items)
+
+    async def bulk_update_objects(self, items: List[Dict]) -> List[T]:
+        return await self.repository.bulk_update(items)
+
+    async def bulk_delete_objects(self, ids: List[int]) -> List[int]:
+        return await self.repository.bulk_delete(ids)
@@ -1,7 +1,18 @@
 from repositories.documents import DocumentRepository
 from .base import BaseService
+from models.models import Document
+from analytics.sketches import record_patient
+from db.db import on_commit
+
+from typing import Dict
 
 
 class DocumentService(BaseService):
     def __init__(self, repository: DocumentRepository):
         super().__init__(repository)
+
+    async def create_object(self, data: Dict) -> Document:
+        result = await super().create_object(data)
+        patient_id, created_at = result.patient_id, result.created_at
+        await on_commit(lambda: record_patient(patient_id, created_at))
+        return result
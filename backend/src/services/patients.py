@@ -1,3 +1,7 @@
+from datetime import date
+from typing import List, Optional, Tuple
+
+from models.models import Patient
 from repositories.patients import PatientRepository
 from .base import BaseService
 
@@ -5,3 +9,13 @@ from .base import BaseService
 class PatientService(BaseService):
     def __init__(self, repository: PatientRepository):
         super().__init__(repository)
+
+    async def search_patients(
+        self,
+        query: str,
+        born_from: Optional[date],
+        born_to: Optional[date],
+        limit: int,
+        offset: int,
+    ) -> List[Tuple[Patient, float]]:
+        return await self.repository.search(query, born_from, born_to, limit, offset)
@@ -1,7 +1,21 @@
 from repositories.roles import RoleRepository
 from .base import BaseService
+from auth.principal import invalidate_all_principals
+from db.db import on_commit
+
+from typing import List
 
 
 class RoleService(BaseService):
     def __init__(self, repository: RoleRepository):
         super().__init__(repository)
+
+    async def delete_object(self, id: int) -> bool:
+        result = await super().delete_object(id)
+        await on_commit(invalidate_all_principals)
+        return result
+
+    async def bulk_delete_objects(self, ids: List[int]) -> List[int]:
+        result = await super().bulk_delete_objects(ids)
+        await on_commit(invalidate_all_principals)
+        return result
@@ -1,6 +1,12 @@
 from repositories.users import UserRepository
 from .base import BaseService
 from models.models import User
+from auth.principal import invalidate_principal
+from auth.utils import hash_password_async, hash_passwords_bulk
+from db.db import on_commit
+
+from typing import Dict, List
+import asyncio
 
 
 class UserService(BaseService):
@@ -9,3 +15,54 @@ class UserService(BaseService):
 
     async def get_object_by_login(self, login: str) -> User:
         return await self.repository.get_by_name(login)
+
+    async def create_object(self, data: Dict) -> User:
+        if hasattr(data, "model_dump"):
+            data = data.model_dump()
+        data["password"] = await hash_password_async(data["password"])
+        return await super().create_object(data)
+
+    async def update_object(self, id: int, data: Dict) -> User:
+        data = dict(data)
+        if data.get("password") is not None:
+            data["password"] = await hash_password_async(data["password"])
+        else:
+            data.pop("password", None)
+        result = await super().update_object(id, data)
+        await on_commit(lambda: invalidate_principal(id))
+        return result
+
+    async def delete_object(self, id: int) -> bool:
+        result = await super().delete_object(id)
+        await on_commit(lambda: invalidate_principal(id))
+        return result
+
+    async def bulk_create_objects(self, items: List[Dict]) -> List[User]:
+        hashed = await hash_passwords_bulk([item["password"] for item in items])
+        items = [{**item, "password": password} for item, password in zip(items, hashed)]
+        return await super().bulk_create_objects(items)
+
+    async def bulk_update_objects(self, items: List[Dict]) -> List[User]:
+        items = [dict(item) for item in items]
+        for item in items:
+            if item.get("password") is None:
+                item.pop("password", None)
+        with_password = [item for item in items if "password" in item]
+        hashed = await hash_passwords_bulk(
+            [item["password"] for item in with_password]
+        )
+        for item, password in zip(with_password, hashed):
+            item["password"] = password
+        result = await super().bulk_update_objects(items)
+        ids = [item["id"] for item in items]
+        await on_commit(
+            lambda: asyncio.gather(*(invalidate_principal(id) for id in ids))
+        )
+        return result
+
+    async def bulk_delete_objects(self, ids: List[int]) -> List[int]:
+        result = await super().bulk_delete_objects(ids)
+        await on_commit(
+            lambda: asyncio.gather(*(invalidate_principal(id) for id in result))
+        )
+        return result
@@ -1,19 +1,30 @@
 import aiohttp
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_process_shutdown, worker_shutdown
 from dotenv import load_dotenv
 import asyncio
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import subprocess
 import os
 import glob
+from typing import Optional
 from yadisk.utils import (
     ensure_yandex_folder_exists,
     get_files_list,
     delete_old_files,
     async_upload_to_yandex_disk,
 )
-from config import logger
+from config import logger, settings
+from db.db import dispose_sync_engine, get_sync_engine
+from db.time_window import TimeWindow
+from db.rollups import reconcile_rollups as reconcile_rollup_tables
+from db.purge import purge_deleted as purge_deleted_rows
+from reports.jobs import cleanup_exports as cleanup_export_files, run_export_job
+from analytics.sketches import (
+    get_sync_redis,
+    rebuild_patient_sketches as rebuild_sketches,
+)
 
 load_dotenv()
 
@@ -38,8 +49,19 @@ celery.conf.update(
     result_accept_content=['json', 'pickle'],
     task_ignore_result=False,
     task_always_eager=False,
+    task_routes={
+        "tasks.purge_deleted": {"queue": "maintenance"},
+        "tasks.cleanup_exports": {"queue": "maintenance"},
+        "tasks.rebuild_patient_sketches": {"queue": "maintenance"},
+        "tasks.export_report": {"queue": "exports"},
+    },
 )
 
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def close_db_connections(**kwargs):
+    dispose_sync_engine()
+
 def clean_old_local_backups(backup_dir: str, keep_count: int = 7):
     try:
         files = glob.glob(os.path.join(backup_dir, "backup_*.sql"))
@@ -133,11 +155,121 @@ def backup_database(self):
         )
         raise
 
+@celery.task(bind=True, name="tasks.reconcile_rollups")
+def reconcile_rollups(self, days: Optional[int] = settings.rollup_reconcile_days):
+    try:
+        since = TimeWindow.last_days(days).start_date if days else None
+        with get_sync_engine().begin() as conn:
+            corrected = reconcile_rollup_tables(conn, since)
+
+        if any(corrected.values()):
+            logger.warning(f"Исправлены расхождения в дневных агрегатах: {corrected}")
+        else:
+            logger.info("Дневные агрегаты совпадают с исходными данными")
+
+        return {"status": "success", "corrected": corrected, "task_id": self.request.id}
+    except Exception as e:
+        logger.error(f"Ошибка сверки дневных агрегатов: {str(e)}")
+        raise
+
+@celery.task(bind=True, name="tasks.purge_deleted")
+def purge_deleted(self):
+    try:
+        purged = purge_deleted_rows(
+            get_sync_engine(), settings.purge_batch_size, settings.purge_batch_pause
+        )
+        if any(purged.values()):
+            logger.info(f"Удалены помеченные записи: {purged}")
+        return {"status": "success", "purged": purged, "task_id": self.request.id}
+    except Exception as e:
+        logger.error(f"Ошибка удаления помеченных записей: {str(e)}")
+        raise
+
+@celery.task(bind=True, name="tasks.export_report")
+def export_report(
+    self,
+    report_type: str,
+    export_format: str,
+    date_from: Optional[str],
+    date_to: Optional[str],
+    user_id: Optional[int],
+    owner_id: int,
+):
+    def on_progress(rows: int, total: int):
+        self.update_state(
+            state="PROGRESS",
+            meta={
+                "rows": rows,
+                "total": total,
+                "percent": round(rows * 100 / total, 1) if total else 0,
+            },
+        )
+
+    try:
+        result = run_export_job(
+            self.request.id,
+            report_type,
+            export_format,
+            date.fromisoformat(date_from) if date_from else None,
+            date.fromisoformat(date_to) if date_to else None,
+            user_id,
+            on_progress,
+        )
+        return {
+            "status": "success",
+            "report_type": report_type,
+            "format": export_format,
+            "owner_id": owner_id,
+            "percent": 100,
+            **result,
+            "task_id": self.request.id,
+        }
+    except Exception as e:
+        logger.error(f"Ошибка выгрузки отчёта {report_type}: {str(e)}")
+        raise
+
+@celery.task(bind=True, name="tasks.cleanup_exports")
+def cleanup_exports(self):
+    removed = cleanup_export_files()
+    if removed:
+        logger.info(f"Удалены устаревшие файлы выгрузок: {removed}")
+    return {"status": "success", "removed": removed, "task_id": self.request.id}
+
+@celery.task(bind=True, name="tasks.rebuild_patient_sketches")
+def rebuild_patient_sketches(self, days: Optional[int] = None):
+    try:
+        since = TimeWindow.last_days(days).start_date if days else None
+        with get_sync_engine().connect() as conn:
+            rebuilt = rebuild_sketches(conn, get_sync_redis(), since)
+        logger.info(f"Скетчи уникальных пациентов пересобраны: {rebuilt}")
+        return {"status": "success", "rebuilt": rebuilt, "task_id": self.request.id}
+    except Exception as e:
+        logger.error(f"Ошибка пересборки скетчей пациентов: {str(e)}")
+        raise
+
 celery.conf.beat_schedule = {
     "daily-backup": {
         "task": "tasks.backup_database",
         "schedule": timedelta(days=1),
     },
+    "nightly-rollup-reconcile": {
+        "task": "tasks.reconcile_rollups",
+        "schedule": crontab(hour=3, minute=30),
+    },
+    "nightly-patient-sketches": {
+        "task": "tasks.rebuild_patient_sketches",
+        "schedule": crontab(hour=4, minute=0),
+    },
+    "purge-deleted": {
+        "task": "tasks.purge_deleted",
+        "schedule": timedelta(minutes=10),
+        "options": {"expires": 600},
+    },
+    "cleanup-exports": {
+        "task": "tasks.cleanup_exports",
+        "schedule": timedelta(minutes=15),
+        "options": {"expires": 900},
+    },
 }
 
 if __name__ == "__main__":
@@ -0,0 +1,79 @@
+"""Сравнение форматов выгрузки отчётов: запись файла и чтение в pandas.
+
+Строки отчёта читаются из БД один раз, затем каждый формат пишется из них
+теми же функциями, что и фоновые выгрузки, и читается так, как это делают
+аналитики в ноутбуках.
+
+Запуск из backend/src с переменными окружения приложения:
+    python -m tests.bench_exports --report patient-records
+"""
+from typing import Callable, Dict, Optional
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+import pandas as pd
+import pyarrow as pa
+
+from db.db import stream_query_sync
+from db.time_window import TimeWindow
+from reports.arrow import report_schema, write_arrow, write_parquet
+from reports.registry import REPORTS, build_report
+from reports.writers import write_csv, write_xlsx
+
+READERS: Dict[str, Callable[[str], pd.DataFrame]] = {
+    "csv": lambda path: pd.read_csv(path, sep=";", encoding="utf-8-sig"),
+    "xlsx": lambda path: pd.read_excel(path, engine="openpyxl"),
+    "parquet": pd.read_parquet,
+    "arrow": lambda path: pa.ipc.open_file(pa.memory_map(path)).read_pandas(),
+}
+
+
+def timed(func: Callable, repeat: int) -> float:
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - started)
+    return statistics.median(runs)
+
+
+def main(report_type: str, days: Optional[int], repeat: int):
+    window = TimeWindow.last_days(days) if days else None
+    report, query = build_report(report_type, window, None)
+    batches = list(stream_query_sync(query, 5000))
+    rows = sum(len(batch) for batch in batches)
+    schema = report_schema(query, report.headers)
+
+    writers = {
+        "csv": lambda path: write_csv(path, report.headers, batches),
+        "xlsx": lambda path: write_xlsx(path, report.headers, batches),
+        "parquet": lambda path: write_parquet(path, schema, batches),
+        "arrow": lambda path: write_arrow(path, schema, batches),
+    }
+
+    print(f"report={report_type} rows={rows} repeat={repeat}")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, write in writers.items():
+            path = os.path.join(directory, f"report.{name}")
+            write_time = timed(lambda: write(path), repeat)
+            read_time = timed(lambda: READERS[name](path), repeat)
+            print(
+                f"{name:<8} write {write_time * 1000:8.1f} ms  "
+                f"read {read_time * 1000:8.1f} ms  "
+                f"{os.path.getsize(path) / 1024:8.0f} KiB"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--report", choices=sorted(REPORTS), default="patient-records")
+    parser.add_argument("--days", type=int, help="период, обязателен для агрегатов")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    main(args.report, args.days, args.repeat)
@@ -0,0 +1,129 @@
+"""Сравнение сериализации списков: ORM объекты против строк Core.
+
+legacy - ORM объекты, валидация from_attributes, json.dumps (как JSONResponse),
+fast   - только поля схемы строками Core в словари, TypeAdapter, orjson (как get_all).
+
+Запуск из backend/src с переменными окружения приложения, в таблице должно
+быть не меньше --rows строк:
+    python -m tests.bench_serialization --table patients --rows 10000
+"""
+from typing import Callable, Dict, List
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import time
+
+import orjson
+from pydantic import TypeAdapter
+from sqlalchemy import select
+
+from db.db import async_session_maker
+from repositories.documents import DocumentRepository
+from repositories.patients import PatientRepository
+from repositories.roles import RoleRepository
+from repositories.users import UserRepository
+from schemas.documents import DocumentInDB
+from schemas.patients import PatientInDB
+from schemas.roles import RoleInDB
+from schemas.users import UserInDB
+
+TABLES = {
+    "patients": (PatientRepository, PatientInDB),
+    "users": (UserRepository, UserInDB),
+    "documents": (DocumentRepository, DocumentInDB),
+    "roles": (RoleRepository, RoleInDB),
+}
+
+
+def render_legacy(adapter: TypeAdapter, items) -> bytes:
+    content = adapter.dump_python(items, mode="json")
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def render_fast(adapter: TypeAdapter, items) -> bytes:
+    return orjson.dumps(adapter.dump_python(items))
+
+
+def fetch_objects(result) -> list:
+    return result.scalars().all()
+
+
+def fetch_dicts(result) -> list:
+    keys = list(result.keys())
+    return [dict(zip(keys, row)) for row in result]
+
+
+async def run_path(
+    query, adapter: TypeAdapter, fetch: Callable, render: Callable
+) -> Dict[str, float]:
+    timings = {}
+    started = time.perf_counter()
+    async with async_session_maker() as session:
+        rows = fetch(await session.execute(query))
+    timings["fetch"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    items = adapter.validate_python(rows, from_attributes=fetch is fetch_objects)
+    timings["validate"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    body = render(adapter, items)
+    timings["render"] = time.perf_counter() - started
+
+    timings["rows"] = len(rows)
+    timings["bytes"] = len(body)
+    return timings
+
+
+async def main(table: str, rows: int, repeat: int):
+    repository_class, schema = TABLES[table]
+    repository = repository_class()
+    adapter = TypeAdapter(List[schema])
+    paths = {
+        "legacy": (select(repository.model).limit(rows), fetch_objects, render_legacy),
+        "fast": (
+            repository.rows_query(schema.model_fields).limit(rows),
+            fetch_dicts,
+            render_fast,
+        ),
+    }
+
+    results = {}
+    for name, (query, fetch, render) in paths.items():
+        await run_path(query, adapter, fetch, render)
+        runs = [await run_path(query, adapter, fetch, render) for _ in range(repeat)]
+        results[name] = {
+            key: statistics.median(run[key] for run in runs) for key in runs[0]
+        }
+
+    fetched = int(results["fast"]["rows"])
+    print(f"table={table} rows={fetched} repeat={repeat}")
+    if fetched < rows:
+        print(f"в таблице меньше {rows} строк, результаты не репрезентативны")
+    for name, result in results.items():
+        total = result["fetch"] + result["validate"] + result["render"]
+        per_row = {
+            key: result[key] / max(result["rows"], 1) * 1e6
+            for key in ("fetch", "validate", "render")
+        }
+        print(
+            f"{name:<7} total {total * 1000:8.1f} ms  "
+            f"{total / max(result['rows'], 1) * 1e6:6.1f} us/row  "
+            f"(fetch {per_row['fetch']:.1f}, validate {per_row['validate']:.1f}, "
+            f"render {per_row['render']:.1f})  {result['bytes'] / 1024:.0f} KiB"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--table", choices=sorted(TABLES), default="patients")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(main(args.table, args.rows, args.repeat))
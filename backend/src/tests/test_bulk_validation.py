@@ -0,0 +1,45 @@
+"""Массовое создание проверяет элементы теми же правилами модели, что и
+создание по одному.
+
+Запуск из backend/src с переменными окружения приложения:
+    python -m pytest tests/test_bulk_validation.py
+Подключение к БД и Redis не требуется: некорректные элементы отклоняются
+до запросов.
+"""
+from fastapi.testclient import TestClient
+import pytest
+
+from app import app
+from auth.auth import get_current_user
+from auth.schema import Principal
+from config import settings
+
+LATIN_FIO = "Ivanov Ivan"
+
+
+@pytest.fixture
+def client():
+    app.dependency_overrides[get_current_user] = lambda: Principal(
+        id=1, login="admin123", fio="Админ", role_id=1, active=True
+    )
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def test_single_create_rejects_latin_fio(client):
+    response = client.post(
+        f"{settings.api_v1_prefix}/patients",
+        json={"fio": LATIN_FIO, "date_of_birth": "2000-01-01"},
+    )
+    assert response.status_code == 400
+
+
+def test_bulk_create_rejects_latin_fio(client):
+    response = client.post(
+        f"{settings.api_v1_prefix}/patients/bulk",
+        json=[{"fio": LATIN_FIO, "date_of_birth": "2000-01-01"}],
+    )
+    assert response.status_code == 201
+    body = response.json()
+    assert body["items"] == []
+    assert [error["index"] for error in body["errors"]] == [0]
@@ -0,0 +1,39 @@
+"""Строки XLSX сверх предела листа Excel переносятся на следующие листы.
+
+Запуск из backend/src с переменными окружения приложения:
+    python -m pytest tests/test_xlsx_writer.py
+"""
+from openpyxl import load_workbook
+
+from reports.writers import write_xlsx
+
+HEADERS = ["ID", "ФИО"]
+
+
+def sheet_values(path):
+    workbook = load_workbook(path, read_only=True)
+    return {
+        sheet.title: [list(row) for row in sheet.iter_rows(values_only=True)]
+        for sheet in workbook.worksheets
+    }
+
+
+def test_rows_over_limit_continue_on_new_sheet(tmp_path):
+    path = tmp_path / "report.xlsx"
+    batches = [[(1, "А"), (2, "Б")], [(3, "В"), (4, "Г"), (5, "Д")]]
+
+    rows = write_xlsx(str(path), HEADERS, batches, sheet_rows=3)
+
+    assert rows == 5
+    assert sheet_values(path) == {
+        "Отчёт": [HEADERS, [1, "А"], [2, "Б"]],
+        "Отчёт 2": [HEADERS, [3, "В"], [4, "Г"]],
+        "Отчёт 3": [HEADERS, [5, "Д"]],
+    }
+
+
+def test_empty_report_keeps_header(tmp_path):
+    path = tmp_path / "report.xlsx"
+
+    assert write_xlsx(str(path), HEADERS, []) == 0
+    assert sheet_values(path) == {"Отчёт": [HEADERS]}